@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+"""
+    benchmarks.encode_dispatch
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Measure the cost of `serialize.all.encode` as the number of
+    registered classes grows. It should stay flat.
+
+    Run it from the root of the repository with:
+
+        python -m benchmarks.encode_dispatch
+
+    :copyright: (c) 2016 by Hernan E. Grecco.
+    :license: BSD, see LICENSE for more details.
+"""
+
+import timeit
+
+from serialize import all
+
+
+def _register_dummy_classes(start, stop):
+    classes = []
+    for ndx in range(start, stop):
+        klass = type("Dummy%d" % ndx, (), {})
+        all.register_class(klass, id, klass)
+        classes.append(klass)
+    return classes
+
+
+def main(counts=(1, 10, 100, 1000), number=200000):
+    print("%10s %16s %16s %16s" % ("classes", "first (ns)", "last (ns)", "other (ns)"))
+
+    classes = []
+    for count in counts:
+        classes.extend(_register_dummy_classes(len(classes), count))
+
+        first, last, other = classes[0](), classes[-1](), object()
+
+        row = [count]
+        for obj in (first, last, other):
+            elapsed = timeit.timeit(lambda: all.encode(obj), number=number)
+            row.append(elapsed / number * 1e9)
+
+        print("%10d %16.1f %16.1f %16.1f" % tuple(row))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+"""
+    benchmarks.import_time
+    ~~~~~~~~~~~~~~~~~~~~~~
+
+    Measure the time and memory needed to `import serialize`, compared to
+    importing it and then loading every available format (which is what
+    `import serialize` used to do).
+
+    Run it from the root of the repository with:
+
+        python -m benchmarks.import_time
+
+    :copyright: (c) 2016 by Hernan E. Grecco.
+    :license: BSD, see LICENSE for more details.
+"""
+
+import statistics
+import subprocess
+import sys
+
+SCRIPTS = {
+    "import serialize": "import serialize",
+    "import + all formats": (
+        "import serialize\n"
+        "from serialize.all import FORMATS, _get_format\n"
+        "for fmt in list(FORMATS):\n"
+        "    _get_format(fmt)\n"
+    ),
+}
+
+# Appended to each script to report the elapsed time, the number of
+# imported modules and the peak resident set size.
+REPORT = (
+    "\nimport resource, sys, time\n"
+    "print(time.perf_counter() - START, len(sys.modules), "
+    "resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)\n"
+)
+
+
+def measure(script, repeat):
+    code = "import time\nSTART = time.perf_counter()\n" + script + REPORT
+    results = []
+    for _ in range(repeat):
+        out = subprocess.check_output([sys.executable, "-c", code])
+        elapsed, modules, maxrss = out.split()
+        results.append((float(elapsed), int(modules), int(maxrss)))
+    return results
+
+
+def main(repeat=20):
+    print("%22s %14s %10s %14s" % ("", "time (ms)", "modules", "max RSS (kB)"))
+    for name, script in SCRIPTS.items():
+        results = measure(script, repeat)
+        elapsed = statistics.median(r[0] for r in results) * 1e3
+        modules = statistics.median(r[1] for r in results)
+        maxrss = statistics.median(r[2] for r in results)
+        print("%22s %14.1f %10d %14d" % (name, elapsed, modules, maxrss))
+
+
+if __name__ == "__main__":
+    main()
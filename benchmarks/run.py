@@ -0,0 +1,326 @@
+# -*- coding: utf-8 -*-
+"""
+    benchmarks.run
+    ~~~~~~~~~~~~~~
+
+    Measure dumps and loads for every registered format on representative
+    payloads: flat scalars, deep nesting, wide lists, large bytes and
+    many registered classes.
+
+    For each combination it reports the throughput, the latency percentiles,
+    the size of the output and the peak memory allocated (using tracemalloc).
+    Combinations that a format cannot serialize are skipped.
+
+    Run it from the root of the repository with:
+
+        python -m benchmarks.run
+
+    Results can be stored and compared against a previous run:
+
+        python -m benchmarks.run --save baseline.json
+        python -m benchmarks.run --baseline baseline.json --threshold 0.1
+
+    When comparing, the exit status is 1 if the median time of any
+    operation got slower by more than the threshold.
+
+    :copyright: (c) 2016 by Hernan E. Grecco.
+    :license: BSD, see LICENSE for more details.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+from serialize import all
+
+#: Number of registered classes used in the classes payload.
+CLASS_COUNT = 50
+
+
+def _to_builtin(obj):
+    return [obj.x, obj.y]
+
+
+class _FromBuiltin:
+    # A picklable from_builtin for dynamically created classes.
+
+    def __init__(self, klass):
+        self.klass = klass
+
+    def __call__(self, content):
+        obj = self.klass.__new__(self.klass)
+        obj.x, obj.y = content
+        return obj
+
+
+def _eq(self, other):
+    return type(self) is type(other) and (self.x, self.y) == (other.x, other.y)
+
+
+def _register_classes(count):
+    # Classes are created here and not at import time so that
+    # importing this module does not register anything.
+    classes = []
+    for ndx in range(count):
+        name = "Record%d" % ndx
+        klass = globals().get(name)
+        if klass is None:
+            klass = type(name, (), {"__eq__": _eq, "__module__": __name__})
+            globals()[name] = klass
+            all.register_class(klass, _to_builtin, _FromBuiltin(klass))
+        classes.append(klass)
+    return classes
+
+
+def _nested(depth, width):
+    if depth == 0:
+        return [1, 2, 3]
+    return {
+        "level%d_%d" % (depth, ndx): _nested(depth - 1, width) for ndx in range(width)
+    }
+
+
+def payload_scalars():
+    out = {}
+    for ndx in range(200):
+        out["int%d" % ndx] = ndx
+        out["float%d" % ndx] = ndx / 7
+        out["str%d" % ndx] = "value %d" % ndx
+        out["bool%d" % ndx] = bool(ndx % 2)
+        out["none%d" % ndx] = None
+    return out
+
+
+def payload_nested():
+    return _nested(6, 4)
+
+
+def payload_wide_list():
+    return [ndx if ndx % 2 else ndx / 3 for ndx in range(10000)]
+
+
+def payload_large_bytes():
+    return {"data": os.urandom(1 << 20)}
+
+
+def payload_classes():
+    classes = _register_classes(CLASS_COUNT)
+    out = []
+    for ndx in range(2000):
+        obj = classes[ndx % len(classes)]()
+        obj.x, obj.y = ndx, str(ndx)
+        out.append(obj)
+    return out
+
+
+PAYLOADS = {
+    "scalars": payload_scalars,
+    "nested": payload_nested,
+    "wide_list": payload_wide_list,
+    "large_bytes": payload_large_bytes,
+    "classes": payload_classes,
+}
+
+
+def _available_formats():
+    out = []
+    for fmt in sorted(all.FORMATS):
+        try:
+            all._get_format(fmt)
+        except ValueError:
+            continue
+        out.append(fmt)
+    return out
+
+
+def _time_calls(func, arg, budget, min_calls=5, max_calls=10000):
+    """Call func(arg) repeatedly for about `budget` seconds
+    and return the elapsed time of each call in seconds.
+    """
+    timings = []
+    perf_counter = time.perf_counter
+    end = perf_counter() + budget
+    while len(timings) < max_calls:
+        start = perf_counter()
+        func(arg)
+        stop = perf_counter()
+        timings.append(stop - start)
+        if stop > end and len(timings) >= min_calls:
+            break
+    return timings
+
+
+def _peak_memory(func, arg):
+    tracemalloc.start()
+    try:
+        func(arg)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak
+
+
+def _percentile(sorted_values, fraction):
+    ndx = min(len(sorted_values) - 1, int(fraction * len(sorted_values)))
+    return sorted_values[ndx]
+
+
+def _summary(timings, size, peak):
+    timings = sorted(timings)
+    median = statistics.median(timings)
+    return {
+        "calls": len(timings),
+        "p50": median,
+        "p90": _percentile(timings, 0.90),
+        "p99": _percentile(timings, 0.99),
+        "ops_per_s": 1 / median if median else float("inf"),
+        "mb_per_s": size / median / 1e6 if median else float("inf"),
+        "peak_bytes": peak,
+    }
+
+
+def bench(fmt, obj, budget):
+    """Benchmark dumps and loads of `obj` using the format `fmt`.
+
+    Returns a dict with the results or None if the format
+    cannot round trip the object.
+    """
+    fh = all._get_format(fmt)
+    try:
+        content = fh.dumps(obj)
+        fh.loads(content)
+    except Exception:
+        return None
+
+    size = len(content)
+    return {
+        "size": size,
+        "dumps": _summary(
+            _time_calls(fh.dumps, obj, budget), size, _peak_memory(fh.dumps, obj)
+        ),
+        "loads": _summary(
+            _time_calls(fh.loads, content, budget),
+            size,
+            _peak_memory(fh.loads, content),
+        ),
+    }
+
+
+def run(formats, payloads, budget, out=sys.stdout):
+    results = {}
+    header = "%-12s %-14s %-6s %10s %10s %10s %10s %10s %12s"
+    row = "%-12s %-14s %-6s %10.3f %10.3f %10.3f %10.1f %10d %12d"
+    columns = ("payload", "format", "op", "p50 (ms)", "p90 (ms)", "p99 (ms)")
+    columns += ("MB/s", "size (B)", "peak (B)")
+    print(header % columns, file=out)
+    for payload in payloads:
+        obj = PAYLOADS[payload]()
+        for fmt in formats:
+            result = bench(fmt, obj, budget)
+            key = "%s/%s" % (payload, fmt)
+            if result is None:
+                print("%-12s %-14s %s" % (payload, fmt, "skipped"), file=out)
+                continue
+            results[key] = result
+            for op in ("dumps", "loads"):
+                r = result[op]
+                print(
+                    row
+                    % (
+                        payload,
+                        fmt,
+                        op,
+                        r["p50"] * 1e3,
+                        r["p90"] * 1e3,
+                        r["p99"] * 1e3,
+                        r["mb_per_s"],
+                        result["size"],
+                        r["peak_bytes"],
+                    ),
+                    file=out,
+                )
+    return results
+
+
+def compare(results, baseline, threshold, out=sys.stdout):
+    """Compare the median time of each operation against a baseline.
+
+    Returns the list of (key, op, ratio) that are slower
+    than the baseline by more than threshold.
+    """
+    regressions = []
+    print(
+        "\n%-30s %-6s %12s %12s %8s" % ("", "op", "base (ms)", "now (ms)", "ratio"),
+        file=out,
+    )
+    for key in sorted(results):
+        if key not in baseline:
+            continue
+        for op in ("dumps", "loads"):
+            before = baseline[key][op]["p50"]
+            now = results[key][op]["p50"]
+            ratio = now / before if before else float("inf")
+            flag = ""
+            if ratio > 1 + threshold:
+                regressions.append((key, op, ratio))
+                flag = "  SLOWER"
+            elif ratio < 1 - threshold:
+                flag = "  faster"
+            print(
+                "%-30s %-6s %12.3f %12.3f %8.2f%s"
+                % (key, op, before * 1e3, now * 1e3, ratio, flag),
+                file=out,
+            )
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1].strip())
+    parser.add_argument(
+        "--formats", nargs="+", help="formats to benchmark (default: all available)"
+    )
+    parser.add_argument(
+        "--payloads",
+        nargs="+",
+        choices=sorted(PAYLOADS),
+        default=list(PAYLOADS),
+        help="payloads to benchmark (default: all)",
+    )
+    parser.add_argument(
+        "--budget",
+        type=float,
+        default=0.5,
+        help="seconds spent timing each operation (default: 0.5)",
+    )
+    parser.add_argument("--save", help="store the results in this JSON file")
+    parser.add_argument("--baseline", help="compare against results in this JSON file")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.1,
+        help="relative slowdown reported as a regression (default: 0.1)",
+    )
+    args = parser.parse_args(argv)
+
+    formats = args.formats or _available_formats()
+    results = run(formats, args.payloads, args.budget)
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as fp:
+            json.dump(results, fp, indent=2, sort_keys=True)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as fp:
+            baseline = json.load(fp)
+        if compare(results, baseline, args.threshold):
+            return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
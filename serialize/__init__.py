@@ -9,45 +9,103 @@
     :license: BSD, see LICENSE for more details.
 """
 
-from importlib import import_module
+from .all import register_lazy_class, register_lazy_format
 
-try:
-    from importlib.metadata import version
-except ImportError:
-    # Backport for Python < 3.8
-    from importlib_metadata import version
 
-try:  # pragma: no cover
-    __version__ = version("serialize")
-except Exception:  # pragma: no cover
-    # we seem to have a local copy not installed without setuptools
-    # so the reported version will be unknown
-    __version__ = "unknown"
+def __getattr__(name):
+    # The version is computed on first access as importing
+    # importlib.metadata takes longer than importing serialize itself.
+    if name != "__version__":
+        raise AttributeError("module %r has no attribute %r" % (__name__, name))
+
+    try:
+        from importlib.metadata import version
+    except ImportError:
+        # Backport for Python < 3.8
+        from importlib_metadata import version
+
+    global __version__
+    try:  # pragma: no cover
+        __version__ = version("serialize")
+    except Exception:  # pragma: no cover
+        # we seem to have a local copy not installed without setuptools
+        # so the reported version will be unknown
+        __version__ = "unknown"
+
+    return __version__
 
 
 # Modules that help serialize use other packages.
+# They are imported on first use of one of their formats.
+# (format, module, required package, name to install it)
 
 _MODULES = (
-    "bson",
-    "dill",
-    "json",
-    "msgpack",
-    "phpserialize",
-    "pickle",
-    "serpent",
-    "yaml",
-    "yaml_legacy",
+    ("bson", ".bson", "bson", "bson"),
+    ("bson:canonical", ".bson", "bson", "bson"),
+    ("dill", ".dill", "dill", "dill"),
+    ("dill:safe", ".dill", "dill", "dill"),
+    ("json", ".json", None, ""),
+    ("json:pretty", ".json", None, ""),
+    ("json:compact", ".json", None, ""),
+    ("json:canonical", ".json", None, ""),
+    ("msgpack", ".msgpack", "msgpack", "msgpack"),
+    ("msgpack:compact", ".msgpack", "msgpack", "msgpack"),
+    ("msgpack:canonical", ".msgpack", "msgpack", "msgpack"),
+    ("phpserialize", ".phpserialize", "phpserialize", "phpserialize"),
+    ("pickle", ".pickle", None, ""),
+    ("pickle:safe", ".pickle", None, ""),
+    ("pickle:oob", ".pickle", None, ""),
+    ("serpent", ".serpent", "serpent", "serpent"),
+    ("yaml", ".yaml", "yaml", "pyyaml"),
+    ("yaml:safe", ".yaml", "yaml", "pyyaml"),
+    ("yaml:legacy", ".yaml_legacy", "yaml", "pyyaml"),
 )
 
-for name in _MODULES:
-    try:
-        import_module("." + name, "serialize")
-    except Exception:
-        pass
+for _fmt, _module, _requires, _pkg in _MODULES:
+    register_lazy_format(_fmt, _module, _requires, _pkg)
+
+# Classes registered by a module imported the first time
+# an instance is encoded or decoded.
+# (class name, module)
+
+_CLASSES = (
+    ("<class 'array.array'>", ".arrays"),
+    ("<class 'numpy.ndarray'>", ".arrays"),
+)
+
+for _name, _module in _CLASSES:
+    register_lazy_class(_name, _module)
 
 # Others to consider in the future for specialized serialization:
 # CSV, pandas.DATAFRAMES, hickle, hdf5
 
-from .all import dump, dumps, load, loads, register_class  # noqa: E402
+# Registers the functions detecting each format from the content.
+from . import sniff  # noqa: E402, F401
+from .all import (  # noqa: E402
+    LazyDocument,
+    digest,
+    dump,
+    dump_many,
+    dumps,
+    iter_load,
+    load,
+    load_path,
+    loads,
+    register_class,
+)
+from .batch import dumps_batch, loads_batch  # noqa: E402
 
-__all__ = ["dump", "dumps", "load", "loads", "register_class"]
+__all__ = [
+    "LazyDocument",
+    "digest",
+    "dump",
+    "dump_many",
+    "dumps",
+    "dumps_batch",
+    "iter_load",
+    "load",
+    "load_path",
+    "loads",
+    "loads_batch",
+    "register_class",
+]
@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+"""
+    serialize.aio
+    ~~~~~~~~~~~~~
+
+    Versions of dump, load and iter_load for asyncio.
+
+    Encoding and decoding are run in an executor and the input/output is done
+    in chunks, so that the event loop is not blocked by large payloads.
+
+    Files can be specified by filename (the format is guessed from the extension
+    as in `serialize.load`) or by asyncio streams (`asyncio.StreamReader`,
+    `asyncio.StreamWriter` or objects with the same interface).
+
+    :copyright: (c) 2016 by Hernan E. Grecco.
+    :license: BSD, see LICENSE for more details.
+"""
+
+import asyncio
+import inspect
+import io
+import pathlib
+
+from . import all
+
+#: Size of the chunks used to read from and write to files and streams.
+CHUNK_SIZE = 1 << 18
+
+# A Sentinel to signal the end of an iterator.
+_DONE = object()
+
+
+def _get_path_and_format(file, fmt):
+    if isinstance(file, str):
+        file = pathlib.Path(file)
+
+    if isinstance(file, pathlib.Path) and fmt is None:
+        fmt = all._get_format_from_path(file)
+
+    return file, all._get_format(fmt)
+
+
+def _read_chunks(fp, buf):
+    chunk = fp.read(CHUNK_SIZE)
+    buf += chunk
+    return len(chunk)
+
+
+async def _read(file, executor):
+    loop = asyncio.get_running_loop()
+    buf = bytearray()
+
+    if isinstance(file, pathlib.Path):
+        fp = await loop.run_in_executor(executor, file.open, "rb")
+        try:
+            while await loop.run_in_executor(executor, _read_chunks, fp, buf):
+                pass
+        finally:
+            await loop.run_in_executor(executor, fp.close)
+    else:
+        while True:
+            chunk = await file.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            buf += chunk
+
+    return buf
+
+
+async def _write(file, content, executor):
+    loop = asyncio.get_running_loop()
+    view = memoryview(content)
+
+    if isinstance(file, pathlib.Path):
+        fp = await loop.run_in_executor(executor, file.open, "wb")
+        try:
+            for start in range(0, len(view), CHUNK_SIZE):
+                chunk = view[start : start + CHUNK_SIZE]
+                await loop.run_in_executor(executor, fp.write, chunk)
+        finally:
+            await loop.run_in_executor(executor, fp.close)
+    else:
+        drain = getattr(file, "drain", None)
+        for start in range(0, len(view), CHUNK_SIZE):
+            result = file.write(view[start : start + CHUNK_SIZE])
+            if inspect.isawaitable(result):
+                await result
+            if drain is not None:
+                await drain()
+
+
+async def dump(obj, file, fmt=None, executor=None):
+    """Serialize `obj` to a file using the format specified by `fmt`
+
+    The file can be specified by a filename or an asyncio stream writer.
+    In the former case the fmt is not need if it can be guessed from the extension.
+
+    The object is serialized in `executor` (by default, the one of the loop).
+    """
+    file, fh = _get_path_and_format(file, fmt)
+    loop = asyncio.get_running_loop()
+    content = await loop.run_in_executor(executor, fh.dumps, obj)
+    await _write(file, content, executor)
+
+
+async def load(file, fmt=None, executor=None):
+    """Deserialize from a file using the format specified by `fmt`
+
+    The file can be specified by a filename or an asyncio stream reader
+    (which is read until EOF). In the former case the fmt is not need if it
+    can be guessed from the extension.
+
+    The object is deserialized in `executor` (by default, the one of the loop).
+    """
+    file, fh = _get_path_and_format(file, fmt)
+    content = await _read(file, executor)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, fh.loads, content)
+
+
+async def _read_stream(reader, size):
+    return await reader.read(size)
+
+
+class _StreamReaderIO(io.RawIOBase):
+    """Blocking file-like object reading from an asyncio stream reader.
+
+    It must be used from a thread other than the one running the event loop.
+    """
+
+    def __init__(self, reader, loop):
+        self.reader = reader
+        self.loop = loop
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        future = asyncio.run_coroutine_threadsafe(
+            _read_stream(self.reader, len(buffer)), self.loop
+        )
+        data = future.result()
+        buffer[: len(data)] = data
+        return len(data)
+
+
+async def iter_load(file, fmt=None, executor=None):
+    """Asynchronously iterate over the objects deserialized from a file written by
+    `serialize.dump_many` using the format specified by `fmt`
+
+    The file can be specified by a filename or an asyncio stream reader.
+    In the former case the fmt is not need if it can be guessed from the extension.
+
+    Objects are read and deserialized one at a time in `executor`
+    (by default, the one of the loop).
+    """
+    file, fh = _get_path_and_format(file, fmt)
+    loop = asyncio.get_running_loop()
+
+    if isinstance(file, pathlib.Path):
+        fp = await loop.run_in_executor(executor, file.open, "rb")
+    else:
+        fp = io.BufferedReader(_StreamReaderIO(file, loop), CHUNK_SIZE)
+
+    try:
+        it = fh.iter_load(fp)
+        while True:
+            obj = await loop.run_in_executor(executor, next, it, _DONE)
+            if obj is _DONE:
+                break
+            yield obj
+    finally:
+        if isinstance(file, pathlib.Path):
+            await loop.run_in_executor(executor, fp.close)
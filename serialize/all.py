@@ -10,17 +10,66 @@
 """
 
 
+import base64
+import hashlib
+import mmap
 import pathlib
+import struct
 from collections import namedtuple
-from io import BytesIO
+from collections.abc import Set as AbstractSet
+from importlib import import_module
+from importlib.util import find_spec
+from io import BytesIO, UnsupportedOperation
+from itertools import chain
+
+from . import compression
 
 #: Stores the functions to convert custom classes to and from builtin types.
 ClassHelper = namedtuple("ClassHelper", "to_builtin from_builtin")
 
+#: Stores the functions to convert lists of instances of a custom class
+#: to and from builtin types.
+BatchHelper = namedtuple("BatchHelper", "to_builtin_many from_builtin_many")
+
 #: Stores information and function about each format type.
-Format = namedtuple("Format", "extension dump dumps load loads register_class")
+Format = namedtuple(
+    "Format", "extension dump dumps load loads register_class dump_many iter_load"
+)
 UnavailableFormat = namedtuple("UnavailableFormat", "extension msg")
 
+#: Stores an implementation of a format and its priority.
+Backend = namedtuple("Backend", "priority format")
+
+#: Stores a function detecting a format and its confidence.
+Sniffer = namedtuple("Sniffer", "confidence func")
+
+
+class LazyFormat:
+    """Placeholder for an available format whose module has not been imported.
+
+    The module (which registers the actual Format) is imported the first time
+    the format is used, so that `import serialize` does not import every
+    serialization package.
+    """
+
+    __slots__ = ("fmt", "extension", "module")
+
+    def __init__(self, fmt, extension, module):
+        self.fmt = fmt
+        self.extension = extension
+        self.module = module
+
+    def __getattr__(self, item):
+        return getattr(_load_lazy_format(self.fmt), item)
+
+    def __repr__(self):
+        return "LazyFormat(fmt=%r, extension=%r, module=%r)" % (
+            self.fmt,
+            self.extension,
+            self.module,
+        )
+
+
 #: Map unavailable formats to the corresponding error message.
 # :type: str -> UnavailableFormat
 UNAVAILABLE_FORMATS = {}
@@ -29,6 +78,15 @@ UNAVAILABLE_FORMATS = {}
 # :type: str -> Format
 FORMATS = {}
 
+#: Map format names to their alternative implementations (backends).
+#: The one in use is also stored in FORMATS.
+# :type: str -> (str -> Backend)
+BACKENDS = {}
+
+#: Map format names to the name of the backend selected with select_backend.
+# :type: str -> str
+SELECTED_BACKENDS = {}
+
 #: Map extension to format name.
 # :type: str -> str
 FORMAT_BY_EXTENSION = {}
@@ -41,6 +99,52 @@ CLASSES = {}
 #: :type: str -> ClassHelper
 CLASSES_BY_NAME = {}
 
+#: Class name used to encode bytes in formats without binary data (see encode_bytes).
+BYTES_CLASS_NAME = str(bytes)
+
+#: Map class names (obtained from str(class)) to the module (relative to
+#: serialize) registering the class, imported the first time an instance
+#: is encoded or decoded.
+#: :type: str -> str
+LAZY_CLASSES = {}
+
+#: Map classes registered with batch functions to the corresponding helper.
+# :type: type -> BatchHelper
+BATCH_CLASSES = {}
+
+#: Map class name obtained from str(class) to the batch functions.
+#: :type: str -> BatchHelper
+BATCH_CLASSES_BY_NAME = {}
+
+#: Memoize the ClassHelper used to encode each type found while encoding.
+#: Types that are not registered are stored as None.
+#: Cleared every time a class is registered.
+#: :type: type -> ClassHelper | None
+_HELPER_BY_TYPE = {}
+
+#: Map compressed formats (fmt+codec) to their Format, built on first use.
+# :type: str -> Format
+_COMPRESSED_FORMATS = {}
+
+#: Map format to the function loading the part of a document selected
+#: by a path without decoding the rest (see load_path).
+#: :type: str -> callable
+PATH_LOADERS = {}
+
+#: Map format to the function detecting it from the content.
+#: :type: str -> Sniffer
+SNIFFERS = {}
+
+# (format, Sniffer) sorted by decreasing confidence.
+# Cleared every time a sniffer is registered.
+_SNIFF_ORDER = []
+
+#: Number of bytes at the beginning of the content given to sniffers.
+SNIFF_SIZE = 64
+
+#: Active instrumentation (see serialize.instrument) or None if disabled.
+_INSTRUMENT = None
+
 
 def _get_format(fmt):
     """Convenience function to get the format information.
@@ -49,7 +153,13 @@ def _get_format(fmt):
     """
 
     if fmt in FORMATS:
-        return FORMATS[fmt]
+        fh = FORMATS[fmt]
+        if type(fh) is LazyFormat:
+            return _load_lazy_format(fmt)
+        return fh
+
+    if isinstance(fmt, str) and "+" in fmt:
+        return _get_compressed_format(fmt)
 
     if fmt in UNAVAILABLE_FORMATS:
         raise ValueError(
@@ -62,6 +172,34 @@ def _get_format(fmt):
     )
 
 
+def _load_lazy_format(fmt):
+    """Import the module of a lazy format and return the registered Format.
+
+    If the module cannot be imported or does not register the format,
+    the format is marked as unavailable and a nice error is raised.
+    """
+    stub = FORMATS[fmt]
+    if type(stub) is not LazyFormat:
+        return stub
+
+    try:
+        import_module(stub.module, "serialize")
+        error = "The module did not register the format."
+    except Exception as ex:
+        error = str(ex)
+
+    fh = FORMATS.get(fmt)
+    if fh is not None and type(fh) is not LazyFormat:
+        return fh
+
+    FORMATS.pop(fmt, None)
+    if fmt not in UNAVAILABLE_FORMATS:
+        msg = "Importing serialize%s failed. %s" % (stub.module, error)
+        register_unavailable(fmt, msg=msg, extension=stub.extension)
+
+    return _get_format(fmt)
+
+
 def _get_format_from_ext(ext):
     """Convenience function to get the format information from a file extension.
 
@@ -79,6 +217,125 @@ def _get_format_from_ext(ext):
     )
 
 
+def _get_format_from_path(path):
+    """Convenience function to get the format information from a filename.
+
+    A compressed format is used if the last extension is the one of
+    a compression codec (e.g. data.msgpack.zst -> msgpack+zstd).
+    """
+    ext = path.suffix.lstrip(".")
+    codec = compression.CODEC_BY_EXTENSION.get(ext.lower())
+    if codec is not None and len(path.suffixes) > 1:
+        return _get_format_from_ext(path.suffixes[-2].lstrip(".")) + "+" + codec
+
+    return _get_format_from_ext(ext)
+
+
+def _get_compressed_format(fmt):
+    """Get the format information of a format composed with a compression
+    codec (fmt+codec).
+
+    Data is compressed and decompressed while the format writes to and reads
+    from the file, so it is not buffered in memory.
+    """
+    fh = _COMPRESSED_FORMATS.get(fmt)
+    if fh is not None:
+        return fh
+
+    base, _, name = fmt.rpartition("+")
+    codec = compression.get_codec(name)
+    base_fh = _get_format(base)
+
+    # The format of the base is looked up on each call,
+    # so that the selected backend is used.
+    def dump(obj, fp):
+        with codec.open(fp, "wb") as cfp:
+            _get_format(base).dump(obj, cfp)
+
+    def dumps(obj):
+        return codec.compress(_get_format(base).dumps(obj))
+
+    def load(fp):
+        with codec.open(fp, "rb") as cfp:
+            return _get_format(base).load(cfp)
+
+    def loads(content):
+        return _get_format(base).loads(codec.decompress(content))
+
+    def dump_many(objs, fp):
+        with codec.open(fp, "wb") as cfp:
+            _get_format(base).dump_many(objs, cfp)
+
+    def iter_load(fp):
+        with codec.open(fp, "rb") as cfp:
+            yield from _get_format(base).iter_load(cfp)
+
+    extension = base_fh.extension
+    if extension:
+        extension += "." + codec.extension
+
+    fh = Format(
+        extension,
+        dump,
+        dumps,
+        load,
+        loads,
+        base_fh.register_class,
+        dump_many,
+        iter_load,
+    )
+    _COMPRESSED_FORMATS[fmt] = fh
+    return fh
+
+
+def _sniff_format(head, size):
+    if not _SNIFF_ORDER:
+        _SNIFF_ORDER.extend(
+            sorted(SNIFFERS.items(), key=lambda item: -item[1].confidence)
+        )
+
+    for fmt, sniffer in _SNIFF_ORDER:
+        if sniffer.func(head, size):
+            return fmt
+
+    raise ValueError(
+        "The format could not be detected. Formats that can be detected are %s"
+        % ", ".join(SNIFFERS.keys())
+    )
+
+
+def sniff_format(content):
+    """Detect the format of serialized content (any object supporting
+    the buffer protocol) by looking only at its first bytes.
+
+    Raises a nice error if the format cannot be detected.
+    """
+    with memoryview(content) as view:
+        size = view.nbytes
+        head = view.cast("B")[:SNIFF_SIZE].tobytes()
+    return _sniff_format(head, size)
+
+
+def _sniff_file(fp):
+    """Detect the format of the content of a file-like object from its
+    current position.
+
+    Returns a file-like object at that position and the format.
+    """
+    try:
+        start = fp.tell()
+        size = fp.seek(0, 2) - start
+        fp.seek(start)
+    except (AttributeError, OSError, UnsupportedOperation):
+        # Not seekable, so it is read into memory.
+        content = fp.read()
+        return BytesIO(content), sniff_format(content)
+
+    head = fp.read(SNIFF_SIZE)
+    fp.seek(start)
+    return fp, _sniff_format(head, size)
+
+
 def encode_helper(obj, to_builtin):
     """Encode an object into a two element dict using a function
     that can convert it to a builtin data type.
@@ -87,14 +344,98 @@ def encode_helper(obj, to_builtin):
     return dict(__class_name__=str(obj.__class__), __dumped_obj__=to_builtin(obj))
 
 
+def _bytes_to_builtin(obj):
+    return base64.b64encode(obj).decode("ascii")
+
+
+def encode_bytes(obj):
+    """Encode a bytes-like object into a two element dict, storing it as base64.
+
+    It is used with serialization packages that do not support binary data.
+    The dict is decoded into bytes.
+    """
+    return dict(__class_name__=BYTES_CLASS_NAME, __dumped_obj__=_bytes_to_builtin(obj))
+
+
+# bytes is not in CLASSES, as most formats support it natively,
+# but the dicts built by encode_bytes are decoded as registered classes.
+CLASSES_BY_NAME[BYTES_CLASS_NAME] = ClassHelper(_bytes_to_builtin, base64.b64decode)
+
+
+def encode_many_helper(objs, to_builtin_many):
+    """Encode a list of objects of the same class into a two element dict
+    using a function that can convert them to a builtin data type.
+    """
+
+    return dict(
+        __class_name__=str(objs[0].__class__), __dumped_many__=to_builtin_many(objs)
+    )
+
+
+def _encode_many(objs, helper):
+    if _INSTRUMENT is not None:
+        _INSTRUMENT.count(str(objs[0].__class__), len(objs))
+    return encode_many_helper(objs, helper.to_builtin_many)
+
+
+def _load_lazy_class(name):
+    """Import the module registering a lazy class (see register_lazy_class).
+
+    Returns True if the module was imported.
+    """
+    module = LAZY_CLASSES.pop(name, None)
+    if module is None:
+        return False
+    import_module(module, "serialize")
+    return True
+
+
+def _lookup_class(klass):
+    """Get the ClassHelper used to encode instances of `klass`,
+    or None if neither the class nor any of its bases are registered.
+
+    An exact match is tried first. Then the method resolution order
+    is walked to find the closest registered base class and, as a last
+    resort, registered classes are checked with `issubclass` to honour
+    virtual subclasses of abstract base classes. Lazy classes are
+    registered when first looked up.
+
+    The result (even a negative one) is memoized in _HELPER_BY_TYPE.
+    """
+    helper = CLASSES.get(klass)
+
+    if helper is None:
+        for base in klass.__mro__[1:]:
+            helper = CLASSES.get(base)
+            if helper is not None:
+                break
+        else:
+            for registered, registered_helper in CLASSES.items():
+                if issubclass(klass, registered):
+                    helper = registered_helper
+                    break
+            else:
+                if LAZY_CLASSES and _load_lazy_class(str(klass)):
+                    return _lookup_class(klass)
+
+    _HELPER_BY_TYPE[klass] = helper
+    return helper
+
+
 def encode(obj, defaultfunc=None):
     """Encode registered types using the corresponding functions.
     For other types, the defaultfunc will be used
     """
 
-    for klass, (to_builtin, _) in CLASSES.items():
-        if isinstance(obj, klass):
-            return encode_helper(obj, to_builtin)
+    try:
+        helper = _HELPER_BY_TYPE[type(obj)]
+    except KeyError:
+        helper = _lookup_class(type(obj))
+
+    if helper is not None:
+        if _INSTRUMENT is not None:
+            _INSTRUMENT.count(str(obj.__class__))
+        return encode_helper(obj, helper.to_builtin)
 
     if defaultfunc is None:
         return obj
@@ -134,14 +475,154 @@ def traverse_and_encode(obj, encode_func=None, trav_dict=None):
     """
     encode_func = encode_func or encode
     trav_dict = trav_dict or DEFAULT_TRAVERSE_EC
-    for t, func in trav_dict.items():
-        if isinstance(obj, t):
-            value = func(obj, encode_func, trav_dict)
-            break
-    else:
-        value = encode_func(obj)
+    return _traverse(obj, _get_plan(_CALL, encode_func, trav_dict))
+
+
+def _keep(obj):
+    return obj
+
+
+def encode_batches(obj):
+    """Encode the lists of instances of a class registered with batch
+    functions (see register_class), leaving other objects as they are.
+
+    It is used with serialization packages that only call back to Python
+    for unsupported objects, and therefore never see the lists.
+    If no such list is found by _has_batch, obj is returned without being
+    copied and its registered objects are encoded one by one.
+    """
+    if not BATCH_CLASSES or not _has_batch(obj, BATCH_CLASSES):
+        return obj
+    return _traverse(obj, _get_plan(_CALL, _keep, DEFAULT_TRAVERSE_EC))
+
+
+def _has_batch(obj, batch):
+    """True if obj holds a list that is encoded with batch functions.
+
+    Lists are assumed to hold elements with the same structure (e.g. records),
+    so only the first element is scanned and the cost does not grow with the
+    length of the document. A batch list found only in other elements is
+    missed, unless another one is found (in which case the whole document
+    is traversed).
+    """
+    if not isinstance(obj, _CONTAINER_TYPES):
+        return False
+
+    stack = [obj]
+    while stack:
+        obj = stack.pop()
+        if isinstance(obj, dict):
+            obj = obj.values()
+        elif isinstance(obj, list):
+            if _is_batch(obj, batch):
+                return True
+            obj = obj[:1]
+
+        stack.extend(el for el in obj if isinstance(el, _CONTAINER_TYPES))
+
+    return False
+
+
+# Canonical encoding.
+#
+# Canonical formats (e.g. json:canonical) serialize equal values to the same
+# bytes, so that the content can be hashed to deduplicate it (see digest).
+# Objects are first converted by `canonical` to builtin types: dicts are
+# rebuilt with sorted keys, -0.0 is normalized, registered classes are
+# encoded and the content of registered set-like classes is sorted.
+
+# Types whose values are compared when sorting, other values are compared
+# by their representation.
+_ORDERED_TYPES = frozenset((str, int, float, bool, bytes))
+
+
+def _sort_key(value):
+    """Key ordering values of any type, first by the name of the type."""
+    if type(value) in _ORDERED_TYPES:
+        return type(value).__name__, value
+    return type(value).__name__, repr(value)
+
+
+def _sort_item(item):
+    return _sort_key(item[0])
+
+
+def _sorted(values, key=_sort_key):
+    """Sort values, which might not be comparable among them."""
+    values = list(values)
+    try:
+        values.sort()
+    except TypeError:
+        values.sort(key=key)
+    return values
+
+
+def _sorted_dict(items):
+    # Keys are unique, so the values are never compared.
+    return dict(_sorted(items, _sort_item))
+
+
+def _canonical_encode(obj):
+    try:
+        helper = _HELPER_BY_TYPE[type(obj)]
+    except KeyError:
+        helper = _lookup_class(type(obj))
+
+    if helper is None:
+        if isinstance(obj, float):
+            # Also converts subclasses, such as numpy.float64.
+            return float(obj) + 0.0
+        return obj
+
+    if _INSTRUMENT is not None:
+        _INSTRUMENT.count(str(obj.__class__))
+
+    content = canonical(helper.to_builtin(obj))
+    if isinstance(obj, AbstractSet) and isinstance(content, (list, tuple)):
+        content = type(content)(_sorted(content))
+
+    return dict(__class_name__=str(obj.__class__), __dumped_obj__=content)
+
+
+def _traverse_dict_sorted_ec(obj, ef, td):
+    return _sorted_dict(
+        (traverse_and_encode(k, ef, td), traverse_and_encode(v, ef, td))
+        for k, v in obj.items()
+    )
+
+
+CANONICAL_TRAVERSE_EC = {
+    dict: _traverse_dict_sorted_ec,
+    list: _traverse_list_ec,
+    tuple: _traverse_tuple_ec,
+}
+
+
+def canonical(obj):
+    """Convert obj to builtin types that are serialized deterministically:
+    equal values give the same content in canonical formats.
+
+    Dicts are rebuilt with their keys sorted (by the name of their type and
+    then by value if they cannot be compared), -0.0 is stored as 0.0 and
+    float subclasses as float. Registered classes are encoded and, for
+    set-like classes (collections.abc.Set) converted to a list or tuple,
+    the elements are sorted.
+    """
+    return _traverse(obj, _get_plan(_CALL, _canonical_encode, CANONICAL_TRAVERSE_EC))
+
 
-    return value
+def has_envelope(content):
+    """Cheaply check if the serialized content (bytes-like or str) might
+    contain registered classes encoded as dicts.
+
+    It never returns False for content that has them, but might return True
+    for content that has not. It is used to skip decoding when possible.
+    """
+    key = "__class_name__" if isinstance(content, str) else b"__class_name__"
+    try:
+        return content.find(key) >= 0
+    except (AttributeError, TypeError):
+        return True
 
 
 def decode(dct, classes_by_name=None):
@@ -161,11 +642,31 @@ def decode(dct, classes_by_name=None):
         _, from_builtin = classes_by_name[s]
         c = dct["__dumped_obj__"]
     except KeyError:
-        return dct
+        if LAZY_CLASSES and _load_lazy_class(s):
+            return decode(dct, classes_by_name)
+        return _decode_many(dct, s)
+
+    if _INSTRUMENT is not None:
+        _INSTRUMENT.count(s)
 
     return from_builtin(c)
 
 
+def _decode_many(dct, s):
+    """Decode a list of objects encoded with encode_many_helper."""
+    try:
+        _, from_builtin_many = BATCH_CLASSES_BY_NAME[s]
+        c = dct["__dumped_many__"]
+    except KeyError:
+        return dct
+
+    objs = list(from_builtin_many(c))
+    if _INSTRUMENT is not None:
+        _INSTRUMENT.count(s, len(objs))
+
+    return objs
+
+
 def _traverse_dict_dc(obj, df, td):
     if "__class_name__" in obj:
         return df(obj)
@@ -191,6 +692,24 @@ DEFAULT_TRAVERSE_DC = {
 }
 
 
+def _traverse_dict_oh(obj, df, td):
+    return df(
+        {
+            traverse_and_decode(k, df, td): traverse_and_decode(v, df, td)
+            for k, v in obj.items()
+        }
+    )
+
+
+#: Traverse calling the decode function on every dict after decoding its
+#: content, as an object_hook does. Used with parsers that lack object hooks.
+OBJECT_HOOK_TRAVERSE_DC = {
+    dict: _traverse_dict_oh,
+    list: _traverse_list_dc,
+    tuple: _traverse_tuple_dc,
+}
+
+
 def traverse_and_decode(obj, decode_func=None, trav_dict=None):
     """Traverse an arbitrary Python object structure
     calling a callback function for every element in the structure,
@@ -200,23 +719,330 @@ def traverse_and_decode(obj, decode_func=None, trav_dict=None):
     """
     decode_func = decode_func or decode
     trav_dict = trav_dict or DEFAULT_TRAVERSE_DC
-    for t, func in trav_dict.items():
-        if isinstance(obj, t):
-            value = func(obj, decode_func, trav_dict)
-            break
-    else:
-        value = obj
+    return _traverse(obj, _get_plan(_LEAF, decode_func, trav_dict))
+
+
+# Traversal plans.
+#
+# traverse_and_encode and traverse_and_decode do not call the functions in
+# `trav_dict` recursively. Instead, for each (func, trav_dict) pair a plan is
+# built that maps every type found to the way it must be handled. The default
+# traversal functions are recognized and executed iteratively using an
+# explicit stack (so deeply nested structures do not hit the recursion limit)
+# and leaf scalars are returned without calling any function. Other traversal
+# functions are called as usual.
+#
+# When encoding with `encode`, lists holding only instances of a class
+# registered with batch functions are encoded at once (see encode_many_helper).
+
+#: Types that are returned as they are (unless registered).
+LEAF_TYPES = (str, int, float, bool, type(None), bytes)
+
+_LEAF_SET = frozenset(LEAF_TYPES)
+
+# Containers traversed by default.
+_CONTAINER_TYPES = (dict, list, tuple)
+
+# How a given type is handled within a plan.
+_LEAF, _CALL, _LIST, _TUPLE, _DICT, _DICT_DC, _DICT_OH, _DICT_SORTED = range(8)
+
+#: Map the default traversal functions to the kind of container.
+_CONTAINER_KINDS = {
+    _traverse_dict_ec: _DICT,
+    _traverse_list_ec: _LIST,
+    _traverse_tuple_ec: _TUPLE,
+    _traverse_dict_dc: _DICT_DC,
+    _traverse_dict_oh: _DICT_OH,
+    _traverse_dict_sorted_ec: _DICT_SORTED,
+    _traverse_list_dc: _LIST,
+    _traverse_tuple_dc: _TUPLE,
+}
+
+#: Map (default kind, func, id(trav_dict)) to the corresponding plan.
+#: Cleared every time a class is registered.
+#: :type: (int, callable, int) -> _TraversalPlan
+_PLANS = {}
+
+# Maximum number of cached plans (protects against callers that
+# build a new function on each call).
+_MAX_PLANS = 64
+
+
+class _TraversalPlan:
+    """Dispatch table mapping each type to a (kind, func) tuple.
+
+    Entries are resolved (once per type) from `trav_dict` following the
+    same rules as isinstance. Types not found in `trav_dict` get the
+    `default` kind which is either _CALL (encode) or _LEAF (decode).
+    """
+
+    def __init__(self, default, func, trav_dict):
+        self.default = default
+        self.func = func
+        self.trav_dict = trav_dict
+        self.table = {}
+
+        # Map classes to their BatchHelper if lists are encoded at once.
+        self.batch = None
+        if default == _CALL and (func is encode or func is _keep) and BATCH_CLASSES:
+            self.batch = BATCH_CLASSES
+
+        # Only scalars that are not registered and not traversed can be
+        # skipped. When encoding with a custom function, everything goes to it.
+        if default == _LEAF or func in (encode, _keep, _canonical_encode):
+            for klass in LEAF_TYPES:
+                if default == _CALL and _lookup_class(klass) is not None:
+                    continue
+                if func is _canonical_encode and klass is float:
+                    continue
+                if any(issubclass(klass, t) for t in trav_dict):
+                    continue
+                self.table[klass] = (_LEAF, None)
+
+    def resolve(self, klass):
+        for t, handler in self.trav_dict.items():
+            if issubclass(klass, t):
+                kind = _CONTAINER_KINDS.get(handler)
+                if kind is None:
+                    entry = (_CALL, _bind(handler, self.func, self.trav_dict))
+                else:
+                    entry = (kind, None)
+                break
+        else:
+            entry = (self.default, self.func)
+
+        self.table[klass] = entry
+        return entry
+
+
+def _bind(handler, func, trav_dict):
+    return lambda obj: handler(obj, func, trav_dict)
+
+
+def _get_plan(default, func, trav_dict):
+    key = (default, func, id(trav_dict))
+    try:
+        return _PLANS[key]
+    except KeyError:
+        pass
+
+    if len(_PLANS) >= _MAX_PLANS:
+        _PLANS.clear()
+
+    # The plan keeps a reference to trav_dict, so its id is not reused.
+    plan = _PLANS[key] = _TraversalPlan(default, func, trav_dict)
+    return plan
 
-    return value
+
+def _traverse(obj, plan):
+    """Traverse obj iteratively following a plan."""
+
+    table = plan.table
+    func = plan.func
+    batch = plan.batch
+
+    try:
+        kind, call = table[type(obj)]
+    except KeyError:
+        kind, call = plan.resolve(type(obj))
+
+    if kind == _LEAF:
+        return obj
+    if kind == _CALL:
+        return call(obj)
+    if kind == _DICT_DC and "__class_name__" in obj:
+        return func(obj)
+    if kind == _LIST and batch is not None and _is_batch(obj, batch):
+        return _encode_many(obj, batch[type(obj[0])])
+
+    # Each frame holds the kind of container, an iterator over its
+    # elements (keys and values interleaved for dicts) and the list
+    # in which the already traversed elements are collected.
+    it = chain.from_iterable(obj.items()) if kind >= _DICT else iter(obj)
+    stack = [(kind, it, [])]
+
+    while True:
+        kind, it, values = stack[-1]
+
+        for el in it:
+            try:
+                el_kind, call = table[type(el)]
+            except KeyError:
+                el_kind, call = plan.resolve(type(el))
+
+            if el_kind == _LEAF:
+                values.append(el)
+            elif el_kind == _CALL:
+                values.append(call(el))
+            elif el_kind == _DICT_DC and "__class_name__" in el:
+                values.append(func(el))
+            elif el_kind == _LIST and batch is not None and _is_batch(el, batch):
+                values.append(_encode_many(el, batch[type(el[0])]))
+            else:
+                if el_kind >= _DICT:
+                    el_it = chain.from_iterable(el.items())
+                else:
+                    el_it = iter(el)
+                stack.append((el_kind, el_it, []))
+                break
+        else:
+            stack.pop()
+
+            if kind == _LIST:
+                value = values
+            elif kind == _TUPLE:
+                value = tuple(values)
+            else:
+                it = iter(values)
+                if kind == _DICT_SORTED:
+                    value = _sorted_dict(zip(it, it))
+                else:
+                    value = dict(zip(it, it))
+                if kind == _DICT_OH:
+                    value = func(value)
+
+            if not stack:
+                return value
+
+            stack[-1][2].append(value)
+
+
+def _is_batch(lst, batch):
+    """True if the list is not empty and all its elements are instances
+    (not of a subclass) of the same class registered with batch functions.
+    """
+    if not lst or type(lst[0]) not in batch:
+        return False
+    return len(set(map(type, lst))) == 1
+
+
+# Compact envelope.
+#
+# Instead of writing the class name in every encoded instance,
+# a document using the compact envelope stores each name once:
+#
+#     {"__classes__": [class name, ...], "__root__": obj}
+#
+# and each instance as {"__c__": index in __classes__, "__o__": dumped obj}.
+# Documents without registered classes are stored as they are, unless they
+# look like an envelope themselves: they are then stored in one with an
+# empty class table.
+
+COMPACT_CLASSES = "__classes__"
+COMPACT_ROOT = "__root__"
+COMPACT_ID = "__c__"
+COMPACT_OBJ = "__o__"
+
+
+class CompactEncoder:
+    """Encode registered classes using compact envelopes,
+    collecting the class names found in a document.
+
+    A new encoder must be used for each document.
+    """
+
+    def __init__(self):
+        self.names = []
+        self.ids = {}
+
+    def __call__(self, obj, defaultfunc=None):
+        try:
+            helper = _HELPER_BY_TYPE[type(obj)]
+        except KeyError:
+            helper = _lookup_class(type(obj))
+
+        if helper is None:
+            if defaultfunc is None:
+                return obj
+            return defaultfunc(obj)
+
+        name = str(obj.__class__)
+        if _INSTRUMENT is not None:
+            _INSTRUMENT.count(name)
+
+        ndx = self.ids.get(name)
+        if ndx is None:
+            ndx = self.ids[name] = len(self.names)
+            self.names.append(name)
+
+        return {COMPACT_ID: ndx, COMPACT_OBJ: helper.to_builtin(obj)}
+
+    def needs_envelope(self, obj):
+        """True if the encoded document must be stored in a compact envelope."""
+        if self.names:
+            return True
+        return (
+            isinstance(obj, dict)
+            and len(obj) == 2
+            and COMPACT_CLASSES in obj
+            and COMPACT_ROOT in obj
+        )
+
+
+def _compact_decoder(names, classes_by_name):
+    helpers = [classes_by_name.get(name) for name in names]
+
+    def decode_compact(dct):
+        if len(dct) != 2 or COMPACT_ID not in dct:
+            return decode(dct, classes_by_name)
+
+        try:
+            helper = helpers[dct[COMPACT_ID]]
+            c = dct[COMPACT_OBJ]
+        except (IndexError, KeyError, TypeError):
+            return dct
+
+        if helper is None:
+            return dct
+
+        if _INSTRUMENT is not None:
+            _INSTRUMENT.count(names[dct[COMPACT_ID]])
+
+        return helper.from_builtin(c)
+
+    return decode_compact
+
+
+def is_compact(obj):
+    """True if obj is a document using the compact envelope."""
+    return (
+        type(obj) is dict
+        and len(obj) == 2
+        and COMPACT_CLASSES in obj
+        and COMPACT_ROOT in obj
+    )
+
+
+def decode_compact(obj, classes_by_name=None):
+    """Decode a document using the compact envelope, bottom up.
+
+    Other objects are returned as they are, so this can be applied
+    to the output of a loader that already decodes verbose envelopes.
+    """
+    if not is_compact(obj):
+        return obj
+
+    classes_by_name = classes_by_name or CLASSES_BY_NAME
+    func = _compact_decoder(obj[COMPACT_CLASSES], classes_by_name)
+
+    # The decoder is specific to this document, so the plan is not cached.
+    plan = _TraversalPlan(_LEAF, func, OBJECT_HOOK_TRAVERSE_DC)
+    return _traverse(obj[COMPACT_ROOT], plan)
 
 
 # A Sentinel for a missing argument.
 MISSING = object()
 
+#: Header prepended to each object by formats without native framing
+#: when several objects are written to the same file.
+FRAME_HEADER = struct.Struct(">Q")
+
 
 def unregister_format(fmt):
     """Register an available serialization format."""
     del FORMATS[fmt]
+    BACKENDS.pop(fmt, None)
+    SELECTED_BACKENDS.pop(fmt, None)
 
 
 def register_format(
@@ -227,6 +1053,10 @@ def register_format(
     loader=None,
     extension=MISSING,
     register_class=None,
+    dump_many=None,
+    iter_load=None,
+    backend=None,
+    priority=0,
 ):
     """Register an available serialization format.
 
@@ -249,11 +1079,27 @@ def register_format(
     `serialize.register_class`. When a new format is registered,
     previously registered classes are called. It takes on argument, the
     class to register. See `serialize.yaml.py` for an example.
+
+    `dump_many` should be a callable taking an iterable and a file-like object
+    that writes the objects one after the other using the native framing of the
+    format (e.g. JSON Lines). `iter_load` should be a callable taking a file-like
+    object and returning an iterator over the objects written by `dump_many`.
+    If missing, they will be generated from `dumpser` and `loadser`, framing each
+    object with its length.
+
+    `backend` is the name of this implementation when several are registered
+    for the same format (e.g. json using the standard library or orjson). They
+    must produce interchangeable payloads. Unless one is chosen using
+    `select_backend`, the one with the highest `priority` is used.
     """
 
-    # For simplicity. We do not allow to overwrite format.
-    if fmt in FORMATS:
-        raise ValueError("%s is already defined." % fmt)
+    # For simplicity. We do not allow to overwrite format
+    # (but lazy formats are replaced when the module is imported).
+    if backend is None:
+        if fmt in FORMATS and type(FORMATS[fmt]) is not LazyFormat:
+            raise ValueError("%s is already defined." % fmt)
+    elif backend in BACKENDS.get(fmt, ()):
+        raise ValueError("%s backend for %s is already defined." % (backend, fmt))
 
     # Here we generate register_class if it is not present
     if not register_class:
@@ -299,17 +1145,106 @@ def register_format(
 
         loader = loadser = raiser
 
+    # Here we generate dump_many/iter_load if they are not present.
+    if not dump_many:
+
+        def dump_many(objs, fp):
+            for obj in objs:
+                content = dumpser(obj)
+                fp.write(FRAME_HEADER.pack(len(content)))
+                fp.write(content)
+
+    if not iter_load:
+
+        def iter_load(fp):
+            while True:
+                header = fp.read(FRAME_HEADER.size)
+                if not header:
+                    return
+                if len(header) < FRAME_HEADER.size:
+                    raise ValueError("Truncated frame header in %s stream" % fmt)
+                (size,) = FRAME_HEADER.unpack(header)
+                content = fp.read(size)
+                if len(content) < size:
+                    raise ValueError("Truncated frame in %s stream" % fmt)
+                yield loadser(content)
+
     if extension is MISSING:
         extension = fmt.split(":", 1)[0]
 
-    FORMATS[fmt] = Format(extension, dumper, dumpser, loader, loadser, register_class)
+    fh = Format(
+        extension,
+        dumper,
+        dumpser,
+        loader,
+        loadser,
+        register_class,
+        dump_many,
+        iter_load,
+    )
+
+    if backend is None:
+        FORMATS[fmt] = fh
+    else:
+        BACKENDS.setdefault(fmt, {})[backend] = Backend(priority, fh)
+        _update_backend(fmt)
 
     if extension and extension not in FORMAT_BY_EXTENSION:
         FORMAT_BY_EXTENSION[extension.lower()] = fmt
 
     # register previously registered classes with the new format
     for klass in CLASSES:
-        FORMATS[fmt].register_class(klass)
+        fh.register_class(klass)
+
+
+def _update_backend(fmt):
+    """Store in FORMATS the selected backend for a format or,
+    if none was selected, the one with the highest priority.
+    """
+    backends = BACKENDS[fmt]
+    selected = SELECTED_BACKENDS.get(fmt)
+    if selected not in backends:
+        selected = max(backends, key=lambda name: backends[name].priority)
+    FORMATS[fmt] = backends[selected].format
+
+
+def select_backend(fmt, backend=None):
+    """Select the implementation used for a format.
+
+    `backend` is the name given when registering the format. If None,
+    the backend with the highest priority will be used.
+    """
+    _get_format(fmt)
+
+    backends = BACKENDS.get(fmt, {})
+    if backend is None:
+        SELECTED_BACKENDS.pop(fmt, None)
+    elif backend in backends:
+        SELECTED_BACKENDS[fmt] = backend
+    else:
+        raise ValueError(
+            "'%s' is an unknown backend for %s. Valid options are %s"
+            % (backend, fmt, ", ".join(backends.keys()))
+        )
+
+    if backends:
+        _update_backend(fmt)
+
+
+def get_backend(fmt):
+    """Name of the backend used for a format (see select_backend),
+    or None if the format has a single implementation.
+    """
+    fh = _get_format(fmt)
+    if fmt not in FORMATS and "+" in fmt:
+        # Compressed formats use the backend of the base format.
+        fmt = fmt.rpartition("+")[0]
+        fh = _get_format(fmt)
+
+    for name, backend in BACKENDS.get(fmt, {}).items():
+        if backend.format is fh:
+            return name
+    return None
 
 
 def register_unavailable(fmt, msg="", pkg="", extension=MISSING):
@@ -325,14 +1260,85 @@ def register_unavailable(fmt, msg="", pkg="", extension=MISSING):
     if extension is MISSING:
         extension = fmt.split(":", 1)[0]
 
+    if type(FORMATS.get(fmt)) is LazyFormat:
+        del FORMATS[fmt]
+
     UNAVAILABLE_FORMATS[fmt] = UnavailableFormat(extension, msg)
 
     if extension and extension not in FORMAT_BY_EXTENSION:
         FORMAT_BY_EXTENSION[extension.lower()] = fmt
 
 
+def register_sniffer(fmt, func, confidence=50):
+    """Register a function detecting content serialized with the format `fmt`
+
+    `func` takes the first `SNIFF_SIZE` bytes of the content (or less, if shorter)
+    and the size of the content, and returns True if the content is likely in
+    this format. It must be cheap and must not raise.
+
+    When detecting, sniffers are tried from the highest to the lowest
+    `confidence` (between 0 and 100) and the first match is used.
+    """
+    SNIFFERS[fmt] = Sniffer(confidence, func)
+    _SNIFF_ORDER.clear()
+
+
+def register_path_loader(fmt, func):
+    """Register a function loading part of a document serialized with the
+    format `fmt` (see load_path).
+
+    `func` takes a binary file-like object and a non empty tuple of dict keys
+    and list indices. It must skip the parts of the document that are not
+    selected without decoding them, and decode registered classes only within
+    the selected part. It raises KeyError or IndexError if the path is not found.
+    """
+    PATH_LOADERS[fmt] = func
+
+
+def register_lazy_class(name, module):
+    """Register a class provided by a module that is imported the first time
+    an instance is encoded or decoded.
+
+    `name` is the name of the class obtained from str(class) and `module`
+    the name of the module (relative to serialize) that calls `register_class`
+    for it when imported. The class itself is not imported.
+    """
+    if name not in CLASSES_BY_NAME:
+        LAZY_CLASSES[name] = module
+
+
+def register_lazy_format(fmt, module, requires=None, pkg="", extension=MISSING):
+    """Register a format provided by a module that is imported on first use.
+
+    `module` is the name of the module (relative to serialize) that calls
+    `register_format` for `fmt` when imported.
+
+    `requires` is the name of the package used by the module. If it cannot be
+    found (which is checked without importing it) the format is registered as
+    unavailable, using `pkg` for the error message.
+    """
+    if requires and find_spec(requires) is None:
+        register_unavailable(fmt, pkg=pkg or requires, extension=extension)
+        return
+
+    if extension is MISSING:
+        extension = fmt.split(":", 1)[0]
+
+    FORMATS[fmt] = LazyFormat(fmt, extension, module)
+
+    if extension and extension not in FORMAT_BY_EXTENSION:
+        FORMAT_BY_EXTENSION[extension.lower()] = fmt
+
+
 def dumps(obj, fmt):
-    """Serialize `obj` to bytes using the format specified by `fmt`"""
+    """Serialize `obj` to bytes using the format specified by `fmt`
+
+    Any format can be compressed using `fmt+codec` (e.g. msgpack+zstd),
+    see serialize.compression.
+    """
+
+    if _INSTRUMENT is not None:
+        return _INSTRUMENT.call("dumps", fmt, _get_format(fmt).dumps, obj)
 
     return _get_format(fmt).dumps(obj)
 
@@ -342,44 +1348,261 @@ def dump(obj, file, fmt=None):
 
     The file can be specified by a file-like object or filename.
     In the latter case the fmt is not need if it can be guessed from the extension.
+    A compressed format is guessed from a double extension (e.g. data.json.gz).
     """
     if isinstance(file, str):
         file = pathlib.Path(file)
 
     if isinstance(file, pathlib.Path):
         if fmt is None:
-            fmt = _get_format_from_ext(file.suffix.lstrip("."))
+            fmt = _get_format_from_path(file)
         with file.open(mode="wb") as fp:
             dump(obj, fp, fmt)
+    elif _INSTRUMENT is not None:
+        dumper = _get_format(fmt).dump
+        _INSTRUMENT.call("dump", fmt, lambda fp: dumper(obj, fp), file)
     else:
         _get_format(fmt).dump(obj, file)
 
 
 def loads(serialized, fmt):
-    """Deserialize bytes using the format specified by `fmt`"""
+    """Deserialize bytes using the format specified by `fmt`
+
+    `serialized` can be any object supporting the buffer protocol
+    (bytes, bytearray, memoryview, mmap). Formats that are able to parse
+    buffers directly do it without making intermediate copies.
+
+    If `fmt` is "auto", the format is detected from the content
+    using the registered sniffers (see `register_sniffer`). Do not use it
+    with untrusted content, as it might be detected as pickle.
+    """
+    if fmt == "auto":
+        fmt = sniff_format(serialized)
+
+    if _INSTRUMENT is not None:
+        return _INSTRUMENT.call("loads", fmt, _get_format(fmt).loads, serialized)
 
     return _get_format(fmt).loads(serialized)
 
 
-def load(file, fmt=None):
+def _load_mmap(fp, fh):
+    """Deserialize from a file-like object by memory-mapping the underlying file.
+
+    Falls back to the load function of the format if the file cannot be mapped.
+    """
+    try:
+        mapped = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+    except (AttributeError, OSError, ValueError, UnsupportedOperation):
+        return fh.load(fp)
+
+    try:
+        start = fp.tell()
+        if start:
+            with memoryview(mapped) as view:
+                return fh.loads(view[start:])
+        return fh.loads(mapped)
+    finally:
+        try:
+            mapped.close()
+        except BufferError:
+            # The deserialized object still references the mapped memory,
+            # which will be unmapped when it is garbage collected.
+            pass
+
+
+def load(file, fmt=None, mmap=False):
     """Deserialize from a file using the format specified by `fmt`
 
     The file can be specified by a file-like object or filename.
     In the latter case the fmt is not need if it can be guessed from the extension.
+
+    If `mmap` is True, the file is memory-mapped and passed to the format
+    instead of being read into memory.
+
+    If `fmt` is "auto", the format is detected from the content
+    using the registered sniffers (see `register_sniffer`).
     """
     if isinstance(file, str):
         file = pathlib.Path(file)
 
     if isinstance(file, pathlib.Path):
         if fmt is None:
-            fmt = _get_format_from_ext(file.suffix.lstrip("."))
+            fmt = _get_format_from_path(file)
         with file.open(mode="rb") as fp:
-            return load(fp, fmt)
+            return load(fp, fmt, mmap)
+
+    if fmt == "auto":
+        file, fmt = _sniff_file(file)
+
+    if _INSTRUMENT is not None:
+        fh = _get_format(fmt)
+        loader = (lambda fp: _load_mmap(fp, fh)) if mmap else fh.load
+        return _INSTRUMENT.call("load", fmt, loader, file)
+
+    if mmap:
+        return _load_mmap(file, _get_format(fmt))
 
     return _get_format(fmt).load(file)
 
 
-def register_class(klass, to_builtin, from_builtin):
+def dump_many(objs, file, fmt=None):
+    """Serialize each object in the iterable `objs`, one after the other,
+    to a file using the format specified by `fmt`
+
+    Objects are written using the native framing of the format (e.g. JSON Lines,
+    YAML documents, consecutive msgpack objects or pickle frames) or, for formats
+    without it, prefixed by their length.
+
+    The file can be specified by a file-like object or filename.
+    In the latter case the fmt is not need if it can be guessed from the extension.
+    """
+    if isinstance(file, str):
+        file = pathlib.Path(file)
+
+    if isinstance(file, pathlib.Path):
+        if fmt is None:
+            fmt = _get_format_from_path(file)
+        with file.open(mode="wb") as fp:
+            dump_many(objs, fp, fmt)
+    else:
+        _get_format(fmt).dump_many(objs, file)
+
+
+def _iter_load_path(path, fh):
+    with path.open(mode="rb") as fp:
+        yield from fh.iter_load(fp)
+
+
+def iter_load(file, fmt=None):
+    """Iterate over the objects deserialized from a file written by `dump_many`
+    using the format specified by `fmt`
+
+    Objects are read one at a time, so memory usage does not depend
+    on the size of the file.
+
+    The file can be specified by a file-like object or filename.
+    In the latter case the fmt is not need if it can be guessed from the extension.
+    """
+    if isinstance(file, str):
+        file = pathlib.Path(file)
+
+    if isinstance(file, pathlib.Path):
+        if fmt is None:
+            fmt = _get_format_from_path(file)
+        return _iter_load_path(file, _get_format(fmt))
+
+    return _get_format(fmt).iter_load(file)
+
+
+class _HashWriter:
+    """Binary file-like object passing the written content to a hash object."""
+
+    def __init__(self, hasher):
+        self.write = hasher.update
+
+
+def digest(obj, fmt="json:canonical", algorithm="sha256"):
+    """Hash the serialization of obj using the format specified by `fmt`
+    and return the hexadecimal digest.
+
+    Use a canonical format (json:canonical, msgpack:canonical, bson:canonical)
+    so that equal values have equal digests. `algorithm` is any name accepted
+    by hashlib.new. The content is passed to the hash object as it is written
+    by the dump function of the format, so formats that write the content
+    in parts are hashed without holding all of it in memory.
+    """
+    hasher = hashlib.new(algorithm)
+    dump(obj, _HashWriter(hasher), fmt)
+    return hasher.hexdigest()
+
+
+def walk(obj, path):
+    """Get the part of obj selected by a sequence of dict keys and list indices."""
+    for key in path:
+        obj = obj[key]
+    return obj
+
+
+def load_path(file, fmt=None, path=()):
+    """Deserialize the part of a document selected by `path` from a file
+    using the format specified by `fmt`
+
+    `path` is a sequence of dict keys and list indices: ("a", "b", 3) selects
+    obj["a"]["b"][3]. Formats with a path loader (json, msgpack and bson)
+    skip the rest of the document without decoding it, others load the whole
+    document. KeyError or IndexError is raised if the path is not found.
+
+    The file can be specified by a file-like object or filename.
+    In the latter case the fmt is not need if it can be guessed from the extension.
+    """
+    if isinstance(file, str):
+        file = pathlib.Path(file)
+
+    if isinstance(file, pathlib.Path):
+        if fmt is None:
+            fmt = _get_format_from_path(file)
+        with file.open(mode="rb") as fp:
+            return load_path(fp, fmt, path)
+
+    path = tuple(path)
+    if not path:
+        return load(file, fmt)
+
+    # The module of the format registers the path loader.
+    _get_format(fmt)
+
+    if fmt not in FORMATS:
+        base, _, name = fmt.rpartition("+")
+        with compression.get_codec(name).open(file, "rb") as fp:
+            return load_path(fp, base, path)
+
+    loader = PATH_LOADERS.get(fmt)
+    if loader is None:
+        return walk(load(file, fmt), path)
+    return loader(file, path)
+
+
+class LazyDocument:
+    """Proxy to a document stored in a file, loading only the parts
+    that are accessed (see load_path).
+
+        >>> doc = LazyDocument("data.msgpack")  # doctest: +SKIP
+        >>> doc["series"][-1].load()  # doctest: +SKIP
+
+    Indexing returns a new proxy without reading the file.
+    `file` can be a filename or a seekable file-like object.
+    """
+
+    def __init__(self, file, fmt=None, path=()):
+        if isinstance(file, str):
+            file = pathlib.Path(file)
+        if fmt is None and isinstance(file, pathlib.Path):
+            fmt = _get_format_from_path(file)
+
+        self.file = file
+        self.fmt = fmt
+        self.path = tuple(path)
+        self._start = None if isinstance(file, pathlib.Path) else file.tell()
+
+    def __getitem__(self, key):
+        proxy = LazyDocument.__new__(LazyDocument)
+        proxy.file, proxy.fmt, proxy._start = self.file, self.fmt, self._start
+        proxy.path = self.path + (key,)
+        return proxy
+
+    def load(self):
+        """Deserialize the part of the document selected by this proxy."""
+        if self._start is not None:
+            self.file.seek(self._start)
+        return load_path(self.file, self.fmt, self.path)
+
+    def __repr__(self):
+        return "LazyDocument(%r, %r, path=%r)" % (self.file, self.fmt, self.path)
+
+
+def register_class(
+    klass, to_builtin, from_builtin, to_builtin_many=None, from_builtin_many=None
+):
     """Register a custom class for serialization and deserialization.
 
     `to_builtin` must be a function that takes an object from the custom class
@@ -390,5 +1613,56 @@ def register_class(klass, to_builtin, from_builtin):
 
     In other words:
         >>> obj == from_builtin(to_builtin(obj))    # doctest: +SKIP
+
+    `to_builtin_many` and `from_builtin_many` are optional functions doing
+    the same for a list of objects of the class (e.g. storing each attribute
+    as a column). If given, lists holding only instances of the class are
+    encoded with a single call instead of one per object:
+        >>> objs == list(from_builtin_many(to_builtin_many(objs)))  # doctest: +SKIP
+
+    Batch functions are used by formats that encode registered classes into
+    dicts (e.g. json, msgpack and bson), but not by pickle, dill and yaml.
     """
+    if (to_builtin_many is None) != (from_builtin_many is None):
+        raise ValueError(
+            "to_builtin_many and from_builtin_many must be given together"
+        )
+
     CLASSES[klass] = CLASSES_BY_NAME[str(klass)] = ClassHelper(to_builtin, from_builtin)
+    if to_builtin_many is None:
+        BATCH_CLASSES.pop(klass, None)
+        BATCH_CLASSES_BY_NAME.pop(str(klass), None)
+    else:
+        BATCH_CLASSES[klass] = BATCH_CLASSES_BY_NAME[str(klass)] = BatchHelper(
+            to_builtin_many, from_builtin_many
+        )
+    _HELPER_BY_TYPE.clear()
+    _PLANS.clear()
+    _notify_formats(klass)
+
+
+def unregister_class(klass):
+    """Remove a class registered with register_class.
+
+    Formats are notified with the same callback used when registering,
+    which checks if the class is still in CLASSES.
+    """
+    del CLASSES[klass]
+    CLASSES_BY_NAME.pop(str(klass), None)
+    BATCH_CLASSES.pop(klass, None)
+    BATCH_CLASSES_BY_NAME.pop(str(klass), None)
+    _HELPER_BY_TYPE.clear()
+    _PLANS.clear()
+    _notify_formats(klass)
+
+
+def _notify_formats(klass):
+    # Notify the formats (and backends) already loaded.
+    # Lazy formats are notified when loaded (see register_format).
+    handlers = {id(fh): fh for fh in FORMATS.values() if type(fh) is Format}
+    for backends in BACKENDS.values():
+        for backend in backends.values():
+            handlers[id(backend.format)] = backend.format
+
+    for fh in handlers.values():
+        fh.register_class(klass)
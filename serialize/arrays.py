@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+"""
+    serialize.arrays
+    ~~~~~~~~~~~~~~~~
+
+    Register numpy.ndarray and array.array storing their type, their shape
+    and their raw contiguous buffer instead of converting them to lists.
+
+    Formats with binary data (msgpack, bson and yaml) store the buffer
+    as it is and json stores it as base64 (see serialize.all.encode_bytes).
+    Arrays are decoded with numpy.frombuffer, without copying the buffer,
+    so they might be read-only. pickle and dill keep their native support.
+
+    This module is imported the first time an array is encoded or decoded
+    (see serialize.all.register_lazy_class). Classes already registered
+    by the user keep their handlers.
+
+    :copyright: (c) 2016 by Hernan E. Grecco.
+    :license: BSD, see LICENSE for more details.
+"""
+
+import array
+import base64
+import sys
+
+from . import all
+
+
+def _register(klass, to_builtin, from_builtin):
+    if klass not in all.CLASSES:
+        all.register_class(klass, to_builtin, from_builtin)
+
+
+def _as_buffer(data):
+    if isinstance(data, dict):
+        # serpent stores bytes as base64 in a dict.
+        return base64.b64decode(data["data"])
+    return data
+
+
+# The buffer of array.array is stored in little endian.
+
+
+def array_to_builtin(arr):
+    if sys.byteorder == "big":
+        arr = array.array(arr.typecode, arr)
+        arr.byteswap()
+    return [arr.typecode, arr.tobytes()]
+
+
+def array_from_builtin(content):
+    typecode, data = content
+    arr = array.array(typecode)
+    arr.frombytes(_as_buffer(data))
+    if sys.byteorder == "big":
+        arr.byteswap()
+    return arr
+
+
+_register(array.array, array_to_builtin, array_from_builtin)
+
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+else:
+    from numpy.lib.format import descr_to_dtype, dtype_to_descr
+
+
+# The dtype of a numpy.ndarray is stored as in .npy files: a string with
+# the byte order (e.g. "<f8") or, for structured arrays, a list of fields.
+
+
+def ndarray_to_builtin(arr):
+    if arr.dtype.hasobject:
+        raise ValueError(
+            "numpy arrays of Python objects cannot be serialized. "
+            "Convert them to lists with tolist()."
+        )
+    return [dtype_to_descr(arr.dtype), list(arr.shape), arr.tobytes()]
+
+
+def ndarray_from_builtin(content):
+    descr, shape, data = content
+    dtype = descr_to_dtype(descr)
+    return numpy.frombuffer(_as_buffer(data), dtype).reshape(shape)
+
+
+if numpy is not None:
+    _register(numpy.ndarray, ndarray_to_builtin, ndarray_from_builtin)
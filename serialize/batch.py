@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+"""
+    serialize.batch
+    ~~~~~~~~~~~~~~~
+
+    Serialize and deserialize many independent objects in parallel
+    using a pool of processes or threads.
+
+    :copyright: (c) 2016 by Hernan E. Grecco.
+    :license: BSD, see LICENSE for more details.
+"""
+
+import os
+import pickle
+import warnings
+from itertools import repeat
+
+from . import all
+
+#: Minimum number of objects sent to a worker at once.
+#: Smaller batches are processed in the calling thread.
+MIN_CHUNK_SIZE = 8
+
+#: Number of chunks per worker. More than one allows to balance
+#: the load when objects take different times to process.
+CHUNKS_PER_WORKER = 4
+
+
+def _dumps_chunk(objs, fmt):
+    dumps = all._get_format(fmt).dumps
+    return [dumps(obj) for obj in objs]
+
+
+def _loads_chunk(payloads, fmt):
+    loads = all._get_format(fmt).loads
+    return [loads(payload) for payload in payloads]
+
+
+def _picklable_classes():
+    """Registered classes (with their helpers and batch functions)
+    that can be sent to a worker process.
+
+    Others (e.g. using lambdas) are only available if the worker is forked.
+    """
+    import multiprocessing
+
+    classes = []
+    dropped = []
+    for klass, helper in all.CLASSES.items():
+        entry = (klass, helper, all.BATCH_CLASSES.get(klass))
+        try:
+            pickle.dumps(entry)
+        except Exception:
+            dropped.append(klass)
+            continue
+        classes.append(entry)
+
+    if dropped and multiprocessing.get_start_method() != "fork":
+        warnings.warn(
+            "The following registered classes cannot be pickled and will not be "
+            "available in the worker processes: %s"
+            % ", ".join(str(klass) for klass in dropped),
+            stacklevel=4,
+        )
+
+    return classes
+
+
+def _init_worker(classes, backends):
+    for klass, (to_builtin, from_builtin), batch in classes:
+        if klass not in all.CLASSES:
+            all.register_class(klass, to_builtin, from_builtin, *(batch or ()))
+
+    for fmt, backend in backends.items():
+        all.select_backend(fmt, backend)
+
+
+def _chunk_size(count, workers):
+    return max(MIN_CHUNK_SIZE, -(-count // (workers * CHUNKS_PER_WORKER)))
+
+
+def _run(func, items, fmt, workers, executor, chunksize):
+    # Imported here as it is slow to import and seldom used.
+    from concurrent import futures
+
+    # Fail early if the format or the executor are not valid.
+    all._get_format(fmt)
+
+    if not isinstance(executor, futures.Executor) and executor not in (
+        "process",
+        "thread",
+    ):
+        raise ValueError(
+            "'%s' is an unknown executor. Valid options are process, thread "
+            "or a concurrent.futures.Executor instance" % executor
+        )
+
+    items = list(items)
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    if chunksize is None:
+        chunksize = _chunk_size(len(items), workers)
+
+    chunks = [items[ndx : ndx + chunksize] for ndx in range(0, len(items), chunksize)]
+
+    if workers <= 1 or len(chunks) <= 1:
+        return func(items, fmt)
+
+    workers = min(workers, len(chunks))
+
+    if isinstance(executor, futures.Executor):
+        return _map(executor, func, chunks, fmt)
+
+    if executor == "process":
+        pool = futures.ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_worker,
+            initargs=(_picklable_classes(), dict(all.SELECTED_BACKENDS)),
+        )
+    else:
+        pool = futures.ThreadPoolExecutor(max_workers=workers)
+
+    with pool:
+        return _map(pool, func, chunks, fmt)
+
+
+def _map(pool, func, chunks, fmt):
+    out = []
+    for chunk in pool.map(func, chunks, repeat(fmt)):
+        out.extend(chunk)
+    return out
+
+
+def dumps_batch(objs, fmt, workers=None, executor="process", chunksize=None):
+    """Serialize each object in `objs` to bytes using the format specified by `fmt`
+
+    Returns a list with the serialized objects in the same order.
+
+    The work is split in chunks that are distributed among `workers`
+    (by default, the number of CPUs) using a pool of processes or threads
+    as specified by `executor`. The pool is started and shut down on each
+    call, which for processes can take longer than serializing a few
+    thousand small objects. When calling this function repeatedly, give an
+    existing `concurrent.futures.Executor` instead, which is reused as it is.
+    If not given, `chunksize` is chosen so that each worker gets a few chunks.
+
+    Classes registered with `register_class` (with their batch functions)
+    and the selected backends are also registered in the worker processes.
+    Classes that cannot be pickled and formats registered at runtime are
+    only available if processes are forked.
+    """
+    return _run(_dumps_chunk, objs, fmt, workers, executor, chunksize)
+
+
+def loads_batch(payloads, fmt, workers=None, executor="process", chunksize=None):
+    """Deserialize each element of `payloads` using the format specified by `fmt`
+
+    Returns a list with the deserialized objects in the same order.
+
+    See `dumps_batch` for the meaning of the other arguments.
+    """
+    return _run(_loads_chunk, payloads, fmt, workers, executor, chunksize)
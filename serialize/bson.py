@@ -11,6 +11,8 @@
     :license: BSD, see LICENSE for more details.
 """
 
+import struct
+
 from . import all
 
 try:
@@ -31,9 +33,185 @@ def dumps(obj):
     return bson.dumps(all.traverse_and_encode(obj))
 
 
+def dumps_canonical(obj):
+    # bson writes the keys in the order of the dict (see serialize.all.canonical).
+    if not isinstance(obj, dict):
+        obj = dict(__bson_follow__=obj)
+    return bson.dumps(all.canonical(obj))
+
+
 def loads(content):
+    # The bson package can only parse bytes and bytearray.
+    if not isinstance(content, (bytes, bytearray)):
+        content = bytes(content)
     obj = all.traverse_and_decode(bson.loads(content))
     return obj.get("__bson_follow__", obj)
 
 
+# Selecting part of a document (see serialize.all.load_path).
+#
+# Each element of a BSON document is stored as its type, its name and its
+# value. The size of each value is known from its type or a length prefix,
+# so elements that are not selected are skipped by seeking over them.
+
+_INT32 = struct.Struct("<i")
+
+_DOUBLE, _STRING, _DOCUMENT, _ARRAY, _BINARY, _REGEX, _DBPOINTER = (
+    0x01,
+    0x02,
+    0x03,
+    0x04,
+    0x05,
+    0x0B,
+    0x0C,
+)
+
+#: Size of the values of fixed size types.
+_FIXED_SIZES = {
+    _DOUBLE: 8,
+    0x06: 0,  # undefined
+    0x07: 12,  # ObjectId
+    0x08: 1,  # boolean
+    0x09: 8,  # datetime
+    0x0A: 0,  # null
+    0x10: 4,  # int32
+    0x11: 8,  # timestamp
+    0x12: 8,  # int64
+    0x13: 16,  # decimal128
+    0x7F: 0,  # max key
+    0xFF: 0,  # min key
+}
+
+# Values prefixed by the length of the content (string, JavaScript code, symbol)
+# and by their total length (document, array, JavaScript code with scope).
+_STRING_TYPES = (_STRING, 0x0D, 0x0E)
+_DOCUMENT_TYPES = (_DOCUMENT, _ARRAY, 0x0F)
+
+
+def _read_int32(fp):
+    return _INT32.unpack(fp.read(4))[0]
+
+
+def _read_cstring(fp):
+    chars = bytearray()
+    while True:
+        char = fp.read(1)
+        if char in (b"\x00", b""):
+            return bytes(chars)
+        chars += char
+
+
+def _value_size(fp, kind):
+    """Size of the value of the given type starting at the current position,
+    which is not changed.
+    """
+    if kind in _FIXED_SIZES:
+        return _FIXED_SIZES[kind]
+
+    start = fp.tell()
+    if kind in _DOCUMENT_TYPES:
+        size = _read_int32(fp)
+    elif kind in _STRING_TYPES:
+        size = 4 + _read_int32(fp)
+    elif kind == _BINARY:
+        size = 5 + _read_int32(fp)
+    elif kind == _DBPOINTER:
+        size = 16 + _read_int32(fp)
+    elif kind == _REGEX:
+        _read_cstring(fp)
+        _read_cstring(fp)
+        size = fp.tell() - start
+    else:
+        raise ValueError("Unknown BSON element type 0x%02x" % kind)
+
+    fp.seek(start)
+    return size
+
+
+def _iter_elements(fp):
+    """Iterate over the (type, name) of the elements of the document starting
+    at the current position. After each one, the position is at its value,
+    which is skipped if the iteration continues.
+    """
+    _read_int32(fp)
+    while True:
+        kind = fp.read(1)[0]
+        if not kind:
+            return
+        name = _read_cstring(fp)
+        yield kind, name
+        fp.seek(_value_size(fp, kind), 1)
+
+
+def _find_element(fp, kind, key):
+    """Move to the value of the element selected by key in the document
+    or array of the given type starting at the current position.
+
+    Returns the type of the element, or None if the document is a registered
+    class (its first element is __class_name__, as written by serialize.all.encode).
+    """
+    if kind == _ARRAY:
+        # Raise the same errors as indexing a list.
+        if not isinstance(key, int):
+            raise TypeError(
+                "list indices must be integers or slices, not %s" % type(key).__name__
+            )
+        if key < 0:
+            start = fp.tell()
+            key += sum(1 for _ in _iter_elements(fp))
+            fp.seek(start)
+        name = str(key).encode("ascii")
+        error = IndexError("list index out of range")
+    else:
+        name = key.encode("utf-8") if isinstance(key, str) else None
+        error = KeyError(key)
+
+    for ndx, (element_kind, element_name) in enumerate(_iter_elements(fp)):
+        if kind == _DOCUMENT and not ndx and element_name == b"__class_name__":
+            return None
+        if element_name == name:
+            return element_kind
+
+    raise error
+
+
+def load_path(fp, path):
+    kind = None
+
+    # Objects that are not dicts are stored in a dummy dictionary (see dumps).
+    start = fp.tell()
+    for element_kind, name in _iter_elements(fp):
+        if name == b"__bson_follow__":
+            kind = element_kind
+        break
+    if kind is None:
+        kind = _DOCUMENT
+        fp.seek(start)
+
+    for ndx, key in enumerate(path):
+        if kind not in (_DOCUMENT, _ARRAY):
+            path = path[ndx:]
+            break
+
+        start = fp.tell()
+        element_kind = _find_element(fp, kind, key)
+        if element_kind is None:
+            # Registered classes are decoded and then walked.
+            fp.seek(start)
+            path = path[ndx:]
+            break
+        kind = element_kind
+    else:
+        path = ()
+
+    # The value is decoded within a document holding only it.
+    value = fp.read(_value_size(fp, kind))
+    element = bytes((kind,)) + b"v\x00" + value
+    document = _INT32.pack(len(element) + 5) + element + b"\x00"
+    obj = all.traverse_and_decode(bson.loads(document)["v"])
+    return all.walk(obj, path)
+
+
 all.register_format("bson", dumps, loads)
+all.register_path_loader("bson", load_path)
+all.register_format("bson:canonical", dumps_canonical, loads)
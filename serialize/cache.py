@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+"""
+    serialize.cache
+    ~~~~~~~~~~~~~~~
+
+    Memoize dumps and loads of objects and content that are serialized
+    or deserialized repeatedly.
+
+        >>> cache = SerializationCache(max_entries=128)
+        >>> config = dict(name="app", workers=4)
+        >>> cache.dumps(config, "pickle") is cache.dumps(config, "pickle")
+        True
+        >>> cache.stats().hits
+        1
+
+    :copyright: (c) 2016 by Hernan E. Grecco.
+    :license: BSD, see LICENSE for more details.
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict, namedtuple
+
+from . import all
+
+#: Statistics of a SerializationCache.
+CacheStats = namedtuple("CacheStats", "hits misses evictions entries nbytes")
+
+
+def _nbytes(content):
+    with memoryview(content) as view:
+        return view.nbytes
+
+
+class SerializationCache:
+    """Least recently used cache for dumps and loads.
+
+    `dumps` results are keyed by the identity of the object (and an optional
+    version) and `loads` results by a hash of the content, both together with
+    the format and the backend in use (see select_backend). Entries are evicted
+    when there are more than `max_entries` or the total size of the serialized
+    content exceeds `max_bytes`.
+
+    It can be shared among threads.
+    """
+
+    def __init__(self, max_entries=1024, max_bytes=64 << 20):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+
+        self._lock = threading.Lock()
+
+        # key -> (value, size, object kept alive while the entry exists)
+        self._entries = OrderedDict()
+        self._nbytes = 0
+
+        self._hits = self._misses = self._evictions = 0
+
+    def _get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return entry
+
+    def _put(self, key, value, size, ref):
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._nbytes -= old[1]
+
+            self._entries[key] = (value, size, ref)
+            self._nbytes += size
+
+            while (
+                len(self._entries) > self.max_entries or self._nbytes > self.max_bytes
+            ):
+                _, (_, evicted_size, _) = self._entries.popitem(last=False)
+                self._nbytes -= evicted_size
+                self._evictions += 1
+
+    def dumps(self, obj, fmt, version=None):
+        """Serialize `obj` to bytes using the format specified by `fmt`
+
+        If the same object was serialized before with the same `fmt` and
+        `version`, the cached bytes are returned. Objects are identified by
+        their id (the cache keeps them alive), so `version` must change if
+        the object is modified.
+        """
+        key = ("dumps", id(obj), fmt, all.get_backend(fmt), version)
+        entry = self._get(key)
+        if entry is not None:
+            return entry[0]
+
+        content = all.dumps(obj, fmt)
+        self._put(key, content, len(content), obj)
+        return content
+
+    def loads(self, content, fmt):
+        """Deserialize bytes using the format specified by `fmt`
+
+        If the same content was deserialized before with the same `fmt`,
+        the cached object is returned. As it is shared among callers,
+        it must not be modified.
+        """
+        digest = hashlib.blake2b(content, digest_size=16).digest()
+        key = ("loads", digest, fmt, all.get_backend(fmt))
+        entry = self._get(key)
+        if entry is not None:
+            return entry[0]
+
+        obj = all.loads(content, fmt)
+        self._put(key, obj, _nbytes(content), None)
+        return obj
+
+    def stats(self):
+        with self._lock:
+            return CacheStats(
+                self._hits,
+                self._misses,
+                self._evictions,
+                len(self._entries),
+                self._nbytes,
+            )
+
+    def clear(self):
+        """Remove all entries and reset the statistics."""
+        with self._lock:
+            self._entries.clear()
+            self._nbytes = 0
+            self._hits = self._misses = self._evictions = 0
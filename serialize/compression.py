@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+"""
+    serialize.compression
+    ~~~~~~~~~~~~~~~~~~~~~
+
+    Compression codecs that can be composed with any format
+    using `fmt+codec` (e.g. `msgpack+zstd` or `json+gz`).
+
+    gzip, bz2 and lzma use the standard library. zstd and lz4 require
+    the zstandard and lz4 packages. Packages are imported on first use.
+
+    Objects are serialized into the compressed stream by the `dump`
+    function of the base format. pickle, dill, msgpack and the canonical
+    formats write it in chunks, so the serialized content is not held in
+    memory at once. Other formats (e.g. json, bson or yaml) serialize
+    the whole object before compressing it.
+
+    :copyright: (c) 2016 by Hernan E. Grecco.
+    :license: BSD, see LICENSE for more details.
+"""
+
+import io
+from collections import namedtuple
+from importlib.util import find_spec
+
+#: Stores the functions of a compression codec.
+#: `open(fp, mode)` wraps a binary file-like object, with mode "rb" or "wb",
+#: and returns a file-like object that decompresses or compresses while
+#: reading or writing. Closing it must not close `fp`.
+Codec = namedtuple("Codec", "extension open compress decompress")
+
+#: Map codec names to the corresponding Codec.
+# :type: str -> Codec
+CODECS = {}
+
+#: Map alternative names (e.g. the file extension) to codec names.
+# :type: str -> str
+CODEC_ALIASES = {}
+
+#: Map file extensions to codec names.
+# :type: str -> str
+CODEC_BY_EXTENSION = {}
+
+# Codecs whose packages are imported on first use.
+# :type: str -> (function returning a Codec, required package, name to install it)
+_LAZY_CODECS = {}
+
+
+def _gzip():
+    import gzip
+
+    # mtime and filename are fixed so that the output only depends on the content.
+    def open(fp, mode):
+        return gzip.GzipFile(filename="", fileobj=fp, mode=mode, mtime=0)
+
+    def compress(data):
+        return gzip.compress(data, mtime=0)
+
+    return Codec("gz", open, compress, gzip.decompress)
+
+
+def _bz2():
+    import bz2
+
+    return Codec("bz2", bz2.BZ2File, bz2.compress, bz2.decompress)
+
+
+def _lzma():
+    import lzma
+
+    return Codec("xz", lzma.LZMAFile, lzma.compress, lzma.decompress)
+
+
+def _zstd():
+    import zstandard
+
+    def open(fp, mode):
+        if mode == "rb":
+            reader = zstandard.ZstdDecompressor().stream_reader(fp, closefd=False)
+            # Provides readline and peek, used by some formats.
+            return io.BufferedReader(reader)
+        return zstandard.ZstdCompressor().stream_writer(fp, closefd=False)
+
+    def compress(data):
+        return zstandard.ZstdCompressor().compress(data)
+
+    def decompress(data):
+        # Frames written by stream_writer do not store the content size.
+        return zstandard.ZstdDecompressor().decompressobj().decompress(data)
+
+    return Codec("zst", open, compress, decompress)
+
+
+def _lz4():
+    import lz4.frame
+
+    return Codec(
+        "lz4", lz4.frame.LZ4FrameFile, lz4.frame.compress, lz4.frame.decompress
+    )
+
+
+def register_codec(name, codec, aliases=()):
+    """Register a compression codec.
+
+    The codec can be used by `name`, any of the `aliases` or its extension.
+    """
+    CODECS[name] = codec
+    _LAZY_CODECS.pop(name, None)
+
+    for alias in (codec.extension,) + tuple(aliases):
+        if alias != name:
+            CODEC_ALIASES[alias] = name
+    CODEC_BY_EXTENSION[codec.extension.lower()] = name
+
+
+def _register_lazy_codec(name, extension, func, requires=None, pkg=""):
+    _LAZY_CODECS[name] = (func, requires, pkg or requires)
+    if extension != name:
+        CODEC_ALIASES[extension] = name
+    CODEC_BY_EXTENSION[extension] = name
+
+
+def get_codec(name):
+    """Get the codec from its name or alias.
+
+    Raises a nice error if the codec is unknown or its package is not installed.
+    """
+    name = CODEC_ALIASES.get(name, name)
+
+    codec = CODECS.get(name)
+    if codec is not None:
+        return codec
+
+    if name not in _LAZY_CODECS:
+        raise ValueError(
+            "'%s' is an unknown compression. Valid options are %s"
+            % (name, ", ".join(sorted(set(CODECS) | set(_LAZY_CODECS))))
+        )
+
+    func, requires, pkg = _LAZY_CODECS[name]
+    if requires and find_spec(requires) is None:
+        raise ValueError(
+            "'%s' is an unavailable compression. "
+            "This compression requires the %s package." % (name, pkg)
+        )
+
+    CODECS[name] = codec = func()
+    del _LAZY_CODECS[name]
+    return codec
+
+
+_register_lazy_codec("gzip", "gz", _gzip)
+_register_lazy_codec("bz2", "bz2", _bz2)
+_register_lazy_codec("lzma", "xz", _lzma)
+_register_lazy_codec("zstd", "zst", _zstd, "zstandard")
+_register_lazy_codec("lz4", "lz4", _lz4, "lz4")
@@ -0,0 +1,316 @@
+# -*- coding: utf-8 -*-
+"""
+    serialize.container
+    ~~~~~~~~~~~~~~~~~~~
+
+    Store many objects in a single file, each serialized with any
+    registered format, and load them by key without reading the others.
+
+        >>> with Container("records.srzc", "w", fmt="msgpack") as box:  # doctest: +SKIP
+        ...     box.put("a", dict(x=1))
+        ...     box.put("b", [1, 2, 3], fmt="json")
+        >>> Container("records.srzc")["a"]  # doctest: +SKIP
+        {'x': 1}
+
+    The file starts with a header holding a magic number and the offset and
+    length of the index: a json object mapping each key to the offset, length
+    and format of its record. Records and indices are appended after it.
+
+    The previous index is kept until a new one is written and the header
+    points to it, so the file can be read while records are added and it
+    is not left unreadable if the writer is interrupted.
+    Replacing or deleting a record only changes the index, the space
+    is reclaimed by `Container.compact`.
+
+    :copyright: (c) 2016 by Hernan E. Grecco.
+    :license: BSD, see LICENSE for more details.
+"""
+
+import json
+import mmap
+import os
+import pathlib
+import struct
+
+from . import all
+
+_MAGIC = b"SRZC\x00\x00\x00\x01"
+
+# Magic number, offset and length of the index.
+_HEADER = struct.Struct("<8sQQ")
+
+_MODES = {"r": "rb", "w": "w+b", "a": "r+b"}
+
+
+def _read_index(fp):
+    """Read the index of a container file.
+
+    Returns a dict mapping keys to [offset, length, format], the size
+    of the file, where new records are written, and the length of the index.
+    An empty index is not written, the header has a length of 0.
+    """
+    size = fp.seek(0, os.SEEK_END)
+    fp.seek(0)
+    header = fp.read(_HEADER.size)
+    if len(header) < _HEADER.size or header[: len(_MAGIC)] != _MAGIC:
+        raise ValueError("%r is not a serialize container." % fp.name)
+
+    _, start, length = _HEADER.unpack(header)
+    if not _HEADER.size <= start <= size - length:
+        raise ValueError("%r is a serialize container with an invalid index." % fp.name)
+
+    fp.seek(start)
+    index = json.loads(fp.read(length)) if length else {}
+    return index, size, length
+
+
+class Container:
+    """A file storing many serialized objects, loaded by key.
+
+    `mode` is "r" to read an existing file, "w" to create a new one
+    (removing the content if it exists) or "a" to add records to an
+    existing file (it is created if it does not exist).
+
+    Records are serialized using the format `fmt`, unless another one
+    is given when they are added. Keys must be strings.
+
+    Records are read from the memory-mapped file. The index is written
+    when the container is flushed or closed, so it should be used as
+    a context manager. Until then, other readers see the previous records.
+    It cannot be shared among threads.
+    """
+
+    def __init__(self, filename, mode="r", fmt="msgpack"):
+        if mode not in _MODES:
+            raise ValueError(
+                "'%s' is not a valid mode. Valid options are %s"
+                % (mode, ", ".join(_MODES))
+            )
+
+        self.filename = pathlib.Path(filename)
+        self.mode = mode
+        self.fmt = fmt
+
+        if mode == "a" and not self.filename.exists():
+            mode = "w"
+
+        self._fp = self.filename.open(_MODES[mode])
+        try:
+            if mode == "w":
+                self._fp.write(_HEADER.pack(_MAGIC, _HEADER.size, 0))
+                self._fp.flush()
+                self._index, self._end, self._index_length = {}, _HEADER.size, 0
+            else:
+                self._index, self._end, self._index_length = _read_index(self._fp)
+            self._modified = False
+        except BaseException:
+            self._fp.close()
+            raise
+
+        self._mapped = None
+        self._pending = False
+
+    # Reading
+
+    def _view(self, entry):
+        offset, length, _ = entry
+        if self._pending:
+            # Written records might still be buffered.
+            self._fp.flush()
+            self._pending = False
+        if self._mapped is None or offset + length > len(self._mapped):
+            self._unmap()
+            self._mapped = mmap.mmap(self._fp.fileno(), 0, access=mmap.ACCESS_READ)
+        return memoryview(self._mapped)[offset : offset + length]
+
+    def _unmap(self):
+        if self._mapped is None:
+            return
+        try:
+            self._mapped.close()
+        except BufferError:
+            # A loaded object still references the mapped memory,
+            # which will be unmapped when it is garbage collected.
+            pass
+        self._mapped = None
+
+    def _load(self, entry):
+        # The view is not released here as the object might reference it.
+        return all.loads(self._view(entry), entry[2])
+
+    def get_bytes(self, key):
+        """Get the serialized record of key and its format."""
+        entry = self._index[key]
+        with self._view(entry) as view:
+            return bytes(view), entry[2]
+
+    def get(self, key, default=None):
+        """Load the object stored with key, or default if it is not found."""
+        entry = self._index.get(key)
+        if entry is None:
+            return default
+        return self._load(entry)
+
+    def get_many(self, keys):
+        """Load the objects stored with keys.
+
+        Records are read in the order they are stored in the file.
+        Raises KeyError if a key is not found.
+        """
+        entries = [self._index[key] for key in keys]
+        order = sorted(range(len(entries)), key=lambda ndx: entries[ndx][0])
+
+        out = [None] * len(entries)
+        for ndx in order:
+            out[ndx] = self._load(entries[ndx])
+        return out
+
+    def __getitem__(self, key):
+        return self._load(self._index[key])
+
+    def __contains__(self, key):
+        return key in self._index
+
+    def __len__(self):
+        return len(self._index)
+
+    def __iter__(self):
+        return iter(self._index)
+
+    def keys(self):
+        return self._index.keys()
+
+    def items(self):
+        """Iterate over the keys and objects, in the order they are stored."""
+        for key, entry in sorted(self._index.items(), key=lambda item: item[1][0]):
+            yield key, self._load(entry)
+
+    # Writing
+
+    def _check_writable(self):
+        if self.mode == "r":
+            raise ValueError("%r was opened for reading." % self)
+
+    def put_bytes(self, key, content, fmt):
+        """Add a record serialized with the format `fmt`."""
+        self.put_many_bytes([(key, content, fmt)])
+
+    def put_many_bytes(self, records):
+        """Add records given as (key, serialized content, format).
+
+        They are written to the file with a single call.
+        """
+        self._check_writable()
+
+        entries = {}
+        chunks = []
+        offset = self._end
+        for key, content, fmt in records:
+            if not isinstance(key, str):
+                raise TypeError("Container keys must be str, not %s" % type(key))
+            entries[key] = [offset, len(content), fmt]
+            chunks.append(content)
+            offset += len(content)
+
+        # The records are written after the index, which is still valid.
+        self._fp.seek(self._end)
+        self._fp.write(b"".join(chunks))
+        self._end = offset
+
+        # Replaced records are left in the file until compact is called.
+        self._index.update(entries)
+        self._modified = self._pending = True
+
+    def put(self, key, obj, fmt=None):
+        """Serialize and add an object."""
+        self.put_many([(key, obj)], fmt)
+
+    def put_many(self, items, fmt=None):
+        """Serialize and add objects given as (key, object) pairs
+        (e.g. dict.items()).
+        """
+        fmt = fmt or self.fmt
+        self.put_many_bytes([(key, all.dumps(obj, fmt), fmt) for key, obj in items])
+
+    def delete(self, key):
+        """Remove a record from the index.
+
+        The space is reclaimed by compact.
+        """
+        self._check_writable()
+        del self._index[key]
+        self._modified = True
+
+    def __setitem__(self, key, obj):
+        self.put(key, obj)
+
+    def __delitem__(self, key):
+        self.delete(key)
+
+    def flush(self):
+        """Write the index after the records and point the header to it."""
+        if not self._modified:
+            return
+
+        content = json.dumps(self._index, separators=(",", ":")).encode("utf-8")
+        self._fp.seek(self._end)
+        self._fp.write(content)
+        self._fp.flush()
+        os.fsync(self._fp.fileno())
+
+        # The previous index is used until the header is written.
+        self._fp.seek(0)
+        self._fp.write(_HEADER.pack(_MAGIC, self._end, len(content)))
+        self._fp.flush()
+        self._end += len(content)
+        self._index_length = len(content)
+        self._modified = False
+
+    def garbage(self):
+        """Number of bytes used by replaced or deleted records
+        and by previous indices.
+        """
+        used = sum(entry[1] for entry in self._index.values())
+        if not self._modified:
+            used += self._index_length
+        return self._end - _HEADER.size - used
+
+    def compact(self):
+        """Rewrite the file with only the records in the index.
+
+        The records are copied without deserializing them to a temporary
+        file in the same folder, which then replaces the original one.
+        """
+        self._check_writable()
+
+        tmp = self.filename.with_name(self.filename.name + ".compact")
+        with Container(tmp, "w", self.fmt) as new:
+            for key, entry in sorted(self._index.items(), key=lambda item: item[1][0]):
+                with self._view(entry) as view:
+                    new.put_bytes(key, view, entry[2])
+
+        self.close()
+        os.replace(tmp, self.filename)
+
+        self._fp = self.filename.open("r+b")
+        self._index, self._end, self._index_length = _read_index(self._fp)
+        self._modified = False
+
+    def close(self):
+        if self._fp.closed:
+            return
+        try:
+            if self.mode != "r":
+                self.flush()
+        finally:
+            self._unmap()
+            self._fp.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __repr__(self):
+        return "Container(%r, %r, fmt=%r)" % (str(self.filename), self.mode, self.fmt)
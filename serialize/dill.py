@@ -11,6 +11,8 @@
     :license: BSD, see LICENSE for more details.
 """
 
+import builtins
+
 from . import all, pickle
 
 try:
@@ -21,7 +23,7 @@ except ImportError:
 
 
 class MyPickler(dill.Pickler):
-    dispatch_table = pickle.DispatchTable()
+    dispatch_table = pickle.DISPATCH_TABLE
 
 
 def dump(obj, fp):
@@ -32,4 +34,63 @@ def load(fp):
     return dill.Unpickler(fp).load()
 
 
-all.register_format("dill", dumper=dump, loader=load)
+def dump_many(objs, fp):
+    for obj in objs:
+        dump(obj, fp)
+
+
+def iter_load(fp):
+    while True:
+        try:
+            yield load(fp)
+        except EOFError:
+            return
+
+
+all.register_format(
+    "dill", dumper=dump, loader=load, dump_many=dump_many, iter_load=iter_load
+)
+
+
+# The safe subformat only loads builtin types and registered classes.
+# See serialize/pickle.py
+
+
+def _load_safe_type(name):
+    # Dill stores some builtin types by name using dill._dill._load_type
+    if name in pickle.SAFE_BUILTINS:
+        return getattr(builtins, name)
+    raise dill.UnpicklingError("type '%s' is forbidden in safe mode" % name)
+
+
+class SafeUnpickler(dill.Unpickler):
+    def find_class(self, module, name):
+        if module == "dill._dill" and name == "_load_type":
+            return _load_safe_type
+        if module == "dill._dill" and name == "_create_array":
+            # Used to store numpy arrays, the globals it gets are checked.
+            pickle.find_safe_class("numpy", "ndarray")
+            return dill._dill._create_array
+        return pickle.find_safe_class(module, name)
+
+
+def load_safe(fp):
+    return SafeUnpickler(fp).load()
+
+
+def iter_load_safe(fp):
+    while True:
+        try:
+            yield load_safe(fp)
+        except EOFError:
+            return
+
+
+all.register_format(
+    "dill:safe",
+    dumper=dump,
+    loader=load_safe,
+    register_class=pickle._register_class,
+    dump_many=dump_many,
+    iter_load=iter_load_safe,
+)
@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+"""
+    serialize.instrument
+    ~~~~~~~~~~~~~~~~~~~~
+
+    Opt-in instrumentation of dumps, dump, loads and load.
+
+    When enabled, each call produces an `Event` with the format, the operation,
+    the elapsed time, the number of bytes written or read and the number of
+    instances of each registered class that were encoded or decoded.
+    Events are sent to one or more sinks: any callable taking an event,
+    such as `Stats` (aggregates in memory) or `LoggingSink`.
+
+        >>> import serialize
+        >>> stats = Stats()
+        >>> with instrumented(stats):
+        ...     _ = serialize.dumps([1, 2, 3], "pickle")
+        >>> stats.totals[("pickle", "dumps")].calls
+        1
+
+    When disabled (the default) the overhead is a single check per call.
+
+    Classes are counted when encoded or decoded through `serialize.all.encode`
+    and `serialize.all.decode`. Formats that call the registered functions
+    directly (pickle and dill) do not report them.
+
+    :copyright: (c) 2016 by Hernan E. Grecco.
+    :license: BSD, see LICENSE for more details.
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import Counter, namedtuple
+from contextlib import contextmanager
+
+from . import all
+
+#: Information about a call to dumps, dump, loads or load.
+#: `classes` maps the class name to the number of instances encoded or decoded.
+Event = namedtuple("Event", "fmt op seconds nbytes classes")
+
+#: Aggregated information about the calls for a given format and operation.
+Totals = namedtuple("Totals", "calls seconds nbytes classes")
+
+
+def _tell(fp):
+    try:
+        return fp.tell()
+    except Exception:
+        return None
+
+
+def _nbytes(content):
+    try:
+        with memoryview(content) as view:
+            return view.nbytes
+    except TypeError:
+        return len(content)
+
+
+class _Instrument:
+    """Measures the calls and sends the events to the sinks."""
+
+    def __init__(self, sinks):
+        self.sinks = sinks
+        self.local = threading.local()
+
+    def count(self, class_name, n=1):
+        counter = getattr(self.local, "counter", None)
+        if counter is not None:
+            counter[class_name] += n
+
+    def call(self, op, fmt, func, arg):
+        outer = getattr(self.local, "counter", None)
+        self.local.counter = counter = Counter()
+        position = _tell(arg) if op in ("dump", "load") else None
+
+        start = time.perf_counter()
+        try:
+            out = func(arg)
+        finally:
+            seconds = time.perf_counter() - start
+            self.local.counter = outer
+
+        if op == "dumps":
+            nbytes = _nbytes(out)
+        elif op == "loads":
+            nbytes = _nbytes(arg)
+        else:
+            nbytes = _file_nbytes(arg, position)
+
+        event = Event(fmt, op, seconds, nbytes, dict(counter))
+        for sink in self.sinks:
+            sink(event)
+
+        return out
+
+
+def _file_nbytes(fp, position):
+    end = _tell(fp)
+    if position is None or end is None:
+        return None
+    if end == position:
+        # A memory-mapped file is read without moving the position.
+        try:
+            return os.fstat(fp.fileno()).st_size - position
+        except Exception:
+            pass
+    return end - position
+
+
+class Stats:
+    """Sink aggregating the events in memory per format and operation.
+
+    It can be shared among threads.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._totals = {}
+
+    def __call__(self, event):
+        key = (event.fmt, event.op)
+        with self._lock:
+            calls, seconds, nbytes, classes = self._totals.get(key, (0, 0.0, 0, ()))
+            classes = Counter(classes)
+            classes.update(event.classes)
+            calls, seconds, nbytes = (
+                calls + 1,
+                seconds + event.seconds,
+                nbytes + (event.nbytes or 0),
+            )
+            self._totals[key] = Totals(calls, seconds, nbytes, classes)
+
+    @property
+    def totals(self):
+        """Dict mapping (fmt, op) to `Totals`."""
+        with self._lock:
+            return dict(self._totals)
+
+    def reset(self):
+        with self._lock:
+            self._totals.clear()
+
+
+class LoggingSink:
+    """Sink logging each event.
+
+    `logger` can be a logging.Logger or its name.
+    """
+
+    def __init__(self, logger="serialize", level=logging.DEBUG):
+        if isinstance(logger, str):
+            logger = logging.getLogger(logger)
+        self.logger = logger
+        self.level = level
+
+    def __call__(self, event):
+        self.logger.log(
+            self.level,
+            "%s %s: %.6f s, %s bytes, classes: %s",
+            event.fmt,
+            event.op,
+            event.seconds,
+            event.nbytes,
+            event.classes,
+        )
+
+
+def enable(*sinks):
+    """Instrument dumps, dump, loads and load sending the events to `sinks`.
+
+    Replaces any previously enabled instrumentation.
+    """
+    if not sinks:
+        raise ValueError("At least one sink is required")
+    all._INSTRUMENT = _Instrument(sinks)
+
+
+def disable():
+    """Stop the instrumentation."""
+    all._INSTRUMENT = None
+
+
+@contextmanager
+def instrumented(*sinks):
+    """Context manager enabling the instrumentation within the block
+    and restoring the previous state afterwards.
+    """
+    previous = all._INSTRUMENT
+    enable(*sinks)
+    try:
+        yield
+    finally:
+        all._INSTRUMENT = previous
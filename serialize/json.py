@@ -11,6 +11,12 @@
     :license: BSD, see LICENSE for more details.
 """
 
+import mmap
+import re
+from importlib import import_module
+from io import FileIO, UnsupportedOperation
+from operator import itemgetter
+
 from . import all
 
 try:
@@ -20,27 +26,388 @@ except ImportError:  # pragma: no cover
     raise
 
 
+def not_serializable(obj):
+    """Raise the same error as the standard library for unsupported objects."""
+    raise TypeError("Object of type %s is not JSON serializable" % type(obj).__name__)
+
+
+#: Names of the classes whose content holds buffers (see serialize.arrays),
+#: which are stored as base64 (see serialize.all.encode_bytes).
+#: Other bytes-like objects are not serializable, as in the standard library.
+BUFFER_CLASS_NAMES = {"<class 'numpy.ndarray'>", "<class 'array.array'>"}
+
+_BUFFER_TYPES = (bytes, bytearray, memoryview)
+
+
+def _encode_buffers(content):
+    return [
+        all.encode_bytes(el) if isinstance(el, _BUFFER_TYPES) else el
+        for el in content
+    ]
+
+
 class Encoder(json.JSONEncoder):
     def default(self, obj):
-        return all.encode(obj, super().default)
+        return default(obj)
+
+
+def default(obj):
+    """Default function for other json backends."""
+    dct = all.encode(obj, not_serializable)
+    if dct["__class_name__"] in BUFFER_CLASS_NAMES:
+        dct["__dumped_obj__"] = _encode_buffers(dct["__dumped_obj__"])
+    return dct
+
+
+# Escape sequences of "_" and lowercase letters (\u005f to \u007a),
+# which might spell the key of an envelope.
+_ESCAPE = re.compile(r"\\u00[5-7]")
+_ESCAPE_BYTES = re.compile(rb"\\u00[5-7]")
+
+
+def has_envelope(content):
+    """Same as serialize.all.has_envelope, but also True for content
+    with escape sequences that might spell the key.
+    """
+    if all.has_envelope(content):
+        return True
+    pattern = _ESCAPE if isinstance(content, str) else _ESCAPE_BYTES
+    try:
+        return pattern.search(content) is not None
+    except TypeError:
+        return True
 
 
 def dumps(obj):
-    return json.dumps(obj, cls=Encoder).encode("utf-8")
+    return json.dumps(all.encode_batches(obj), cls=Encoder).encode("utf-8")
 
 
 def dumps_pretty(obj):
     return json.dumps(
-        obj, cls=Encoder, sort_keys=True, indent=4, separators=(",", ": ")
+        all.encode_batches(obj),
+        cls=Encoder,
+        sort_keys=True,
+        indent=4,
+        separators=(",", ": "),
     ).encode("utf-8")
 
 
 def loads(content):
-    return json.loads(content.decode("utf-8"), object_hook=all.decode)
+    content = str(content, "utf-8")
+
+    # Calling object_hook for every object is slow, so it is only
+    # used if the document might contain encoded registered classes.
+    if has_envelope(content):
+        return json.loads(content, object_hook=all.decode)
+    return json.loads(content)
+
+
+def dumps_compact(obj):
+    encoder = all.CompactEncoder()
+
+    def default_compact(obj):
+        dct = encoder(obj, not_serializable)
+        if encoder.names[dct[all.COMPACT_ID]] in BUFFER_CLASS_NAMES:
+            dct[all.COMPACT_OBJ] = _encode_buffers(dct[all.COMPACT_OBJ])
+        return dct
+
+    obj = all.encode_batches(obj)
+    content = json.dumps(obj, default=default_compact)
+    if not encoder.needs_envelope(obj):
+        return content.encode("utf-8")
+
+    # The class table is only known after encoding the object.
+    return (
+        '{"%s": %s, "%s": %s}'
+        % (all.COMPACT_CLASSES, json.dumps(encoder.names), all.COMPACT_ROOT, content)
+    ).encode("utf-8")
+
+
+def loads_compact(content):
+    return all.decode_compact(loads(content))
+
+
+# Canonical json uses the standard library, whatever backend is selected,
+# without whitespace and keeping non-ASCII characters. Each element is
+# canonicalized as it is written (see serialize.all.canonical), but the keys
+# of objects are sorted by the string stored in json (e.g. "10" before "9"),
+# so that dumping the loaded content gives the same bytes.
+
+_CANONICAL = json.JSONEncoder(
+    ensure_ascii=False, separators=(",", ":"), default=not_serializable
+)
+
+#: Size of the chunks written by dump_canonical.
+CHUNK_SIZE = 1 << 16
+
+# Types of the values encoded as they are, unless a float might be -0.0.
+_FLAT_TYPES = frozenset((str, int, float, bool, type(None)))
+
+
+def _is_flat(values):
+    types = set(map(type, values))
+    return _FLAT_TYPES.issuperset(types) and (float not in types or 0.0 not in values)
+
+
+def _canonical_key(key):
+    """Return the string stored in json for a dict key."""
+    key = all._canonical_encode(key)
+    if isinstance(key, str):
+        return key
+    if key is None or isinstance(key, (int, float)):
+        return _CANONICAL.encode(key)
+    raise TypeError(
+        "keys must be str, int, float, bool or None, not %s" % type(key).__name__
+    )
+
+
+def _iter_canonical(obj):
+    """Yield the canonical json of obj in parts."""
+
+    # Each frame holds an iterator over the (prefix, element) pairs
+    # of a container and its closing bracket.
+    stack = [(iter((("", obj),)), "")]
+    while stack:
+        it, close = stack[-1]
+        for prefix, el in it:
+            el = all._canonical_encode(el)
+
+            if isinstance(el, dict):
+                if el.get("__class_name__") in BUFFER_CLASS_NAMES:
+                    el = dict(el, __dumped_obj__=_encode_buffers(el["__dumped_obj__"]))
+                if set(map(type, el)) <= {str} and _is_flat(el.values()):
+                    yield prefix + _CANONICAL.encode(dict(sorted(el.items())))
+                    continue
+
+                items = sorted(
+                    ((_canonical_key(key), value) for key, value in el.items()),
+                    key=itemgetter(0),
+                )
+                yield prefix + "{"
+                parts = (
+                    (("," if ndx else "") + _CANONICAL.encode(key) + ":", value)
+                    for ndx, (key, value) in enumerate(items)
+                )
+                stack.append((parts, "}"))
+                break
+
+            if isinstance(el, (list, tuple)):
+                if _is_flat(el):
+                    yield prefix + _CANONICAL.encode(el)
+                    continue
+
+                yield prefix + "["
+                parts = (("," if ndx else "", value) for ndx, value in enumerate(el))
+                stack.append((parts, "]"))
+                break
+
+            yield prefix + _CANONICAL.encode(el)
+        else:
+            stack.pop()
+            yield close
+
+
+def dumps_canonical(obj):
+    return "".join(_iter_canonical(obj)).encode("utf-8")
+
+
+def dump_canonical(obj, fp):
+    # Written in chunks, without holding the content (see serialize.all.digest).
+    chunks = []
+    size = 0
+    for part in _iter_canonical(obj):
+        chunks.append(part)
+        size += len(part)
+        if size >= CHUNK_SIZE:
+            fp.write("".join(chunks).encode("utf-8"))
+            chunks.clear()
+            size = 0
+
+    fp.write("".join(chunks).encode("utf-8"))
+
+
+# Multiple objects are stored as JSON Lines (one compact document per line).
+
+
+def json_lines(dumps, loads):
+    """Build dump_many and iter_load functions for JSON Lines
+    from the dumps and loads functions of a backend.
+    """
+
+    def dump_many(objs, fp):
+        for obj in objs:
+            fp.write(dumps(obj) + b"\n")
+
+    def iter_load(fp):
+        for line in fp:
+            if line.strip():
+                yield loads(line)
+
+    return dump_many, iter_load
+
+
+dump_many, iter_load = json_lines(dumps, loads)
+
+
+# Selecting part of a document (see serialize.all.load_path).
+#
+# The content is scanned without parsing it, jumping over strings and
+# counting brackets to skip values. Only the selected value is parsed.
+
+_STRING_PATTERN = rb'"[^"\\]*(?:\\.[^"\\]*)*"'
+
+_WHITESPACE = re.compile(rb"[ \t\n\r]*")
+_STRING = re.compile(_STRING_PATTERN)
+_SCALAR = re.compile(rb"[^,\]}\s]+")
+_STRING_OR_BRACKET = re.compile(_STRING_PATTERN + rb"|[\[\]{}]")
+
+
+def _skip_whitespace(content, pos):
+    return _WHITESPACE.match(content, pos).end()
+
+
+def _skip_value(content, pos):
+    """Return the position after the value starting at pos."""
+    first = content[pos]
+    if first == 0x22:  # "
+        return _STRING.match(content, pos).end()
+    if first not in b"[{":
+        return _SCALAR.match(content, pos).end()
+
+    # Strings are jumped over, so brackets within them are not counted.
+    depth = 0
+    for match in _STRING_OR_BRACKET.finditer(content, pos):
+        char = content[match.start()]
+        if char == 0x22:
+            continue
+        depth += 1 if char in b"[{" else -1
+        if not depth:
+            return match.end()
+
+    raise ValueError("Unterminated JSON array or object at %d" % pos)
+
+
+def _find_key(content, pos, key):
+    """Return the position of the value of key in the object starting at pos,
+    or None if the object is a registered class (its first key is __class_name__,
+    as written by serialize.all.encode).
+    """
+    if isinstance(key, str):
+        name = key.encode("utf-8")
+    else:
+        name = None
+
+    pos = first = _skip_whitespace(content, pos + 1)
+    while content[pos] != 0x7D:  # }
+        match = _STRING.match(content, pos)
+        found = match.group()[1:-1]
+        if b"\\" in found:
+            found = json.loads(match.group()).encode("utf-8")
+        if found == b"__class_name__" and pos == first:
+            return None
+
+        # Skip the colon.
+        pos = _skip_whitespace(content, _skip_whitespace(content, match.end()) + 1)
+        if found == name:
+            return pos
+
+        pos = _skip_whitespace(content, _skip_value(content, pos))
+        if content[pos] == 0x2C:  # ,
+            pos = _skip_whitespace(content, pos + 1)
+
+    raise KeyError(key)
+
+
+def _find_index(content, pos, index):
+    """Return the position of the element in the array starting at pos."""
+    starts = []
+    pos = _skip_whitespace(content, pos + 1)
+    while content[pos] != 0x5D:  # ]
+        if isinstance(index, int) and index == len(starts):
+            return pos
+        starts.append(pos)
+
+        pos = _skip_whitespace(content, _skip_value(content, pos))
+        if content[pos] == 0x2C:  # ,
+            pos = _skip_whitespace(content, pos + 1)
+
+    # Raises the same errors as indexing a list.
+    return starts[index]
+
+
+def loads_path(content, path, pos=0):
+    """Deserialize the part of the document in content (from pos)
+    selected by path.
+    """
+    pos = _skip_whitespace(content, pos)
+    for ndx, key in enumerate(path):
+        first = content[pos]
+        if first == 0x7B:  # {
+            found = _find_key(content, pos, key)
+            if found is None:
+                # Registered classes are decoded and then walked.
+                path = path[ndx:]
+                break
+            pos = found
+        elif first == 0x5B:  # [
+            pos = _find_index(content, pos, key)
+        else:
+            path = path[ndx:]
+            break
+    else:
+        path = ()
+
+    # Parsed with the selected backend.
+    obj = all._get_format("json").loads(content[pos : _skip_value(content, pos)])
+    return all.walk(obj, path)
+
+
+def load_path(fp, path):
+    # Decompressing streams (e.g. gzip.GzipFile) have the fileno
+    # of the compressed file, so only plain files are mapped.
+    if not isinstance(getattr(fp, "raw", fp), FileIO):
+        return loads_path(fp.read(), path)
+
+    try:
+        mapped = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+    except (AttributeError, OSError, ValueError, UnsupportedOperation):
+        return loads_path(fp.read(), path)
+
+    with mapped:
+        return loads_path(mapped, path, fp.tell())
 
 
 # We create two different subformats for json.
 # The first (default) is compact, the second is pretty.
 
-all.register_format("json", dumps, loads)
+all.register_format(
+    "json",
+    dumps,
+    loads,
+    dump_many=dump_many,
+    iter_load=iter_load,
+    backend="json",
+)
 all.register_format("json:pretty", dumps_pretty, loads)
+all.register_format("json:canonical", dumps_canonical, loads, dumper=dump_canonical)
+all.register_path_loader("json", load_path)
+all.register_path_loader("json:pretty", load_path)
+
+# Registered classes are stored using the compact envelope (see serialize.all).
+dump_many_compact, iter_load_compact = json_lines(dumps_compact, loads_compact)
+all.register_format(
+    "json:compact",
+    dumps_compact,
+    loads_compact,
+    dump_many=dump_many_compact,
+    iter_load=iter_load_compact,
+)
+
+# Faster backends for the compact json format are used if installed.
+# See serialize/orjson.py for an example.
+
+for name in ("orjson", "rapidjson", "ujson"):
+    try:
+        import_module("." + name, "serialize")
+    except ImportError:
+        pass
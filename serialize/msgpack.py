@@ -5,27 +5,251 @@
 
     Helpers for Msgpack Serialization.
 
-    See https://pypi.python.org/pypi/msgpack-python for more details.
+    See https://pypi.org/project/msgpack for more details.
 
     :copyright: (c) 2016 by Hernan E. Grecco.
     :license: BSD, see LICENSE for more details.
 """
 
+from itertools import chain
+
 from . import all
 
 try:
     import msgpack
 except ImportError:
-    all.register_unavailable("msgpack", pkg="msgpack-python")
+    all.register_unavailable("msgpack", pkg="msgpack")
     raise
 
 
+# Registered classes are stored as an extension type with the following code,
+# holding the class name and the dumped object packed as an array.
+# Maps are then decoded by msgpack without calling back to Python.
+# Other extension type codes are left as msgpack.ExtType.
+EXT_CODE = 1
+
+
+def not_serializable(obj):
+    raise TypeError("can not serialize %r object" % type(obj).__name__)
+
+
+def default(obj):
+    dct = all.encode(obj, not_serializable)
+    content = (dct["__class_name__"], dct["__dumped_obj__"])
+    data = msgpack.packb(content, default=default, use_bin_type=True)
+    return msgpack.ExtType(EXT_CODE, data)
+
+
+def ext_hook(code, data):
+    if code != EXT_CODE:
+        return msgpack.ExtType(code, data)
+    name, dumped = msgpack.unpackb(data, ext_hook=ext_hook, raw=False)
+    return all.decode(dict(__class_name__=name, __dumped_obj__=dumped))
+
+
 def dumps(obj):
-    return msgpack.packb(obj, default=all.encode)
+    return msgpack.packb(all.encode_batches(obj), default=default, use_bin_type=True)
+
+
+# dump writes containers with more than STREAM_MIN_ITEMS elements, or holding
+# other containers, element by element in chunks of about CHUNK_SIZE bytes,
+# so that the packed content is not held in memory at once (e.g. when
+# compressing, see serialize.compression). The output is the same as dumps.
+
+#: Minimum number of elements of a container written element by element.
+STREAM_MIN_ITEMS = 1024
+
+#: Size of the chunks written to the file.
+CHUNK_SIZE = 1 << 16
+
+
+def _nested(values):
+    return any(type(value) in (dict, list, tuple) for value in values)
+
+
+def _pack_stream(obj, fp, packer, canonical=False):
+    # If canonical, each element is canonicalized as it is written
+    # (see serialize.all.canonical).
+    chunks = []
+    size = 0
+
+    # Iterators over the elements of the containers being written.
+    stack = [iter((obj,))]
+    while stack:
+        for el in stack[-1]:
+            kind = type(el)
+            if kind is dict and (len(el) > STREAM_MIN_ITEMS or _nested(el.values())):
+                if canonical:
+                    el = all._sorted_dict(
+                        (all.canonical(key), value) for key, value in el.items()
+                    )
+                data = packer.pack_map_header(len(el))
+                items = chain.from_iterable(el.items())
+            elif (kind is list or kind is tuple) and (
+                len(el) > STREAM_MIN_ITEMS or _nested(el)
+            ):
+                data = packer.pack_array_header(len(el))
+                items = iter(el)
+            else:
+                data = packer.pack(all.canonical(el) if canonical else el)
+                items = None
+
+            chunks.append(data)
+            size += len(data)
+            if size >= CHUNK_SIZE:
+                fp.write(b"".join(chunks))
+                chunks.clear()
+                size = 0
+
+            if items is not None:
+                stack.append(items)
+                break
+        else:
+            stack.pop()
+
+    fp.write(b"".join(chunks))
+
+
+def dump(obj, fp):
+    packer = msgpack.Packer(default=default, use_bin_type=True)
+    _pack_stream(all.encode_batches(obj), fp, packer)
 
 
 def loads(content):
-    return msgpack.unpackb(content, object_hook=all.decode, raw=False)
+    # Classes encoded as maps (by previous versions and msgpack:canonical).
+    if all.has_envelope(content):
+        return msgpack.unpackb(
+            content, ext_hook=ext_hook, object_hook=all.decode, raw=False
+        )
+    return msgpack.unpackb(content, ext_hook=ext_hook, raw=False)
+
+
+# Msgpack objects are self delimiting, so multiple objects
+# are just written one after the other.
+
+
+def dump_many(objs, fp):
+    packer = msgpack.Packer(default=default, use_bin_type=True)
+    for obj in objs:
+        fp.write(packer.pack(all.encode_batches(obj)))
+
+
+def iter_load(fp):
+    # A stream cannot be checked in advance for classes encoded as maps.
+    yield from msgpack.Unpacker(
+        fp, ext_hook=ext_hook, object_hook=all.decode, raw=False
+    )
+
+
+def load_path(fp, path):
+    # The file is read in chunks, and skipped objects are not built.
+    # Skipped objects are buffered, so they are limited to 4 GiB.
+    unpacker = msgpack.Unpacker(
+        fp,
+        ext_hook=ext_hook,
+        object_hook=all.decode,
+        raw=False,
+        max_buffer_size=0,
+    )
+
+    for ndx, key in enumerate(path):
+        try:
+            size = unpacker.read_map_header()
+        except ValueError:
+            pass
+        else:
+            for item in range(size):
+                name = unpacker.unpack()
+                if name == "__class_name__" and not item:
+                    # A registered class stored as a map (e.g. by msgpack:canonical).
+                    dct = {name: unpacker.unpack()}
+                    for _ in range(size - 1):
+                        name = unpacker.unpack()
+                        dct[name] = unpacker.unpack()
+                    return all.walk(all.decode(dct), path[ndx:])
+                if name == key:
+                    break
+                unpacker.skip()
+            else:
+                raise KeyError(key)
+            continue
+
+        try:
+            size = unpacker.read_array_header()
+        except ValueError:
+            # Neither a map nor an array (e.g. a registered class).
+            return all.walk(unpacker.unpack(), path[ndx:])
+
+        # Raises the same errors as indexing a list.
+        for _ in range(range(size)[key]):
+            unpacker.skip()
+
+    return unpacker.unpack()
+
+
+# Canonical msgpack stores registered classes as maps (see serialize.all.canonical).
+
+
+def dumps_canonical(obj):
+    return msgpack.packb(
+        all.canonical(obj), default=not_serializable, use_bin_type=True
+    )
+
+
+def dump_canonical(obj, fp):
+    # Written in chunks, without holding the content (see serialize.all.digest).
+    packer = msgpack.Packer(default=not_serializable, use_bin_type=True)
+    _pack_stream(obj, fp, packer, canonical=True)
+
+
+# Registered classes are stored using the compact envelope (see serialize.all).
+
+# Header of a map with two entries (the class table and the root object).
+_FIXMAP_2 = b"\x82"
+
+
+def dumps_compact(obj):
+    encoder = all.CompactEncoder()
+    obj = all.encode_batches(obj)
+    content = msgpack.packb(obj, default=encoder, use_bin_type=True)
+    if not encoder.needs_envelope(obj):
+        return content
+
+    # The class table is only known after encoding the object.
+    return b"".join(
+        (
+            _FIXMAP_2,
+            msgpack.packb(all.COMPACT_CLASSES),
+            msgpack.packb(encoder.names),
+            msgpack.packb(all.COMPACT_ROOT),
+            content,
+        )
+    )
+
+
+def loads_compact(content):
+    return all.decode_compact(loads(content))
+
+
+def dump_many_compact(objs, fp):
+    for obj in objs:
+        fp.write(dumps_compact(obj))
+
+
+def iter_load_compact(fp):
+    for obj in iter_load(fp):
+        yield all.decode_compact(obj)
 
 
-all.register_format("msgpack", dumps, loads)
+all.register_format(
+    "msgpack", dumps, loads, dump, dump_many=dump_many, iter_load=iter_load
+)
+all.register_path_loader("msgpack", load_path)
+all.register_format("msgpack:canonical", dumps_canonical, loads, dumper=dump_canonical)
+all.register_format(
+    "msgpack:compact",
+    dumps_compact,
+    loads_compact,
+    dump_many=dump_many_compact,
+    iter_load=iter_load_compact,
+)
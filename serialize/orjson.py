@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""
+    serialize.orjson
+    ~~~~~~~~~~~~~~~~
+
+    Fast backend for JSON Serialization.
+
+    See https://github.com/ijl/orjson for more details.
+
+    :copyright: (c) 2016 by Hernan E. Grecco.
+    :license: BSD, see LICENSE for more details.
+"""
+
+import enum
+import uuid
+
+import orjson
+
+from . import all, json
+
+# Non string keys are converted as the standard library does, while
+# dataclasses, datetimes and subclasses of builtin types (which orjson
+# supports natively) are given to the default function, so that
+# registered classes are encoded.
+OPTIONS = (
+    orjson.OPT_NON_STR_KEYS
+    | orjson.OPT_PASSTHROUGH_DATACLASS
+    | orjson.OPT_PASSTHROUGH_DATETIME
+    | orjson.OPT_PASSTHROUGH_SUBCLASS
+)
+
+# orjson serializes enums and UUIDs itself, without calling the default
+# function, and there is no option to pass them through. If a subclass
+# of these is registered, the standard library is used instead.
+#
+# orjson also dumps NaN and Infinity as null, and finding them costs about
+# as much as encoding again with the standard library, which is done for
+# content with null (see dumps). As this is often slower than using the
+# standard library directly, this backend has a lower priority and must
+# be chosen with select_backend("json", "orjson").
+_NATIVE_TYPES = (enum.Enum, uuid.UUID)
+
+# Registered classes that orjson would serialize itself.
+_NATIVE_REGISTERED = set()
+
+
+def register_class(klass):
+    if klass not in all.CLASSES:
+        # Unregistered.
+        _NATIVE_REGISTERED.discard(klass)
+    elif issubclass(klass, _NATIVE_TYPES):
+        _NATIVE_REGISTERED.add(klass)
+
+
+def dumps(obj):
+    if _NATIVE_REGISTERED:
+        return json.dumps(obj)
+
+    try:
+        content = orjson.dumps(
+            all.encode_batches(obj), default=json.default, option=OPTIONS
+        )
+    except TypeError:
+        # orjson rejects some objects that the standard library
+        # accepts (e.g. integers larger than 64 bits).
+        return json.dumps(obj)
+
+    # orjson dumps NaN and Infinity as null, while the standard library
+    # keeps them. Only content with null might have them.
+    if b"null" in content:
+        return json.dumps(obj)
+    return content
+
+
+def loads(content):
+    if not isinstance(content, (bytes, bytearray, memoryview, str)):
+        content = memoryview(content)
+    try:
+        obj = orjson.loads(content)
+    except orjson.JSONDecodeError:
+        # orjson rejects some documents that the standard library
+        # accepts (e.g. NaN and Infinity).
+        return json.loads(content)
+    if json.has_envelope(content):
+        obj = all.traverse_and_decode(obj, trav_dict=all.OBJECT_HOOK_TRAVERSE_DC)
+    return obj
+
+
+dump_many, iter_load = json.json_lines(dumps, loads)
+
+all.register_format(
+    "json",
+    dumps,
+    loads,
+    dump_many=dump_many,
+    iter_load=iter_load,
+    register_class=register_class,
+    backend="orjson",
+    priority=-10,
+)
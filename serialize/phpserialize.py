@@ -60,8 +60,12 @@ CUSTOM_CLASSES_BY_NAME = ChainMap(
 )
 
 
+def _decode(obj):
+    return all.decode(obj, CUSTOM_CLASSES_BY_NAME)
+
+
 def mytransverse(obj):
-    return all.traverse_and_decode(obj, lambda o: all.decode(o, CUSTOM_CLASSES_BY_NAME))
+    return all.traverse_and_decode(obj, _decode)
 
 
 def dumps(obj):
@@ -11,7 +11,13 @@
     :license: BSD, see LICENSE for more details.
 """
 
+import array
+import builtins
+import codecs
+import importlib
+import struct
 from collections.abc import MutableMapping
+from io import BytesIO
 
 from . import all
 
@@ -23,18 +29,59 @@ except ImportError:  # pragma: no cover
     raise
 
 
+#: Map each registered class to the function used to reduce its instances.
+#: Built once per class when it is registered.
+#: :type: type -> callable
+REDUCERS = {}
+
+#: Names of classes that are pickled natively even if registered, as pickle
+#: already stores their raw buffer (out-of-band in pickle:oob).
+#: See serialize.arrays.
+NATIVE_CLASS_NAMES = {"<class 'numpy.ndarray'>", "<class 'array.array'>"}
+
+#: Globals used by pickle to rebuild the classes in NATIVE_CLASS_NAMES,
+#: which the safe subformats load if the class is registered.
+#: :type: str -> tuple of (module, name)
+NATIVE_GLOBALS = {
+    "<class 'numpy.ndarray'>": (
+        ("numpy", "ndarray"),
+        ("numpy", "dtype"),
+        ("numpy._core.multiarray", "_reconstruct"),
+        # numpy < 2
+        ("numpy.core.multiarray", "_reconstruct"),
+    ),
+    "<class 'array.array'>": (
+        ("array", "array"),
+        ("array", "_array_reconstructor"),
+    ),
+}
+
+
+def _build_reducer(helper):
+    to_builtin, from_builtin = helper
+
+    def reduce(obj):
+        return from_builtin, (to_builtin(obj),)
+
+    return reduce
+
+
 class DispatchTable(MutableMapping):
-    def __getitem__(self, item):
-        if item in all.CLASSES:
-            return lambda obj: (
-                all.CLASSES[item].from_builtin,
-                (all.CLASSES[item].to_builtin(obj),),
-                None,
-                None,
-                None,
-            )
+    """Dispatch table with the reducers of the registered classes,
+    falling back to copyreg.dispatch_table for other types.
+    """
 
-        return copyreg.dispatch_table[item]  # pragma: no cover
+    def get(self, item, default=None):
+        reducer = REDUCERS.get(item)
+        if reducer is None:
+            return copyreg.dispatch_table.get(item, default)
+        return reducer
+
+    def __getitem__(self, item):
+        reducer = self.get(item)
+        if reducer is None:
+            raise KeyError(item)
+        return reducer
 
     def __setitem__(self, key, value):  # pragma: no cover
         copyreg.dispatch_table[key] = value
@@ -49,8 +96,19 @@ class DispatchTable(MutableMapping):
         return copyreg.dispatch_table.__len__()
 
 
+#: Dispatch table shared by the picklers of pickle and dill.
+DISPATCH_TABLE = DispatchTable()
+
+
 class MyPickler(pickle.Pickler):
-    dispatch_table = DispatchTable()
+    # The C pickler looks up the dispatch_table with __getitem__,
+    # raising KeyError for every unregistered type. Registered classes
+    # are instead checked here with a dictionary lookup.
+    def reducer_override(self, obj):
+        reducer = REDUCERS.get(type(obj))
+        if reducer is None:
+            return NotImplemented
+        return reducer(obj)
 
 
 def dump(obj, fp):
@@ -61,4 +119,312 @@ def load(fp):
     return pickle.Unpickler(fp).load()
 
 
-all.register_format("pickle", dumper=dump, loader=load)
+def loads(content):
+    # pickle.loads parses any bytes-like object without copying it.
+    return pickle.loads(content)
+
+
+# Pickle frames are self delimiting, so multiple objects
+# are just pickled one after the other.
+
+
+def dump_many(objs, fp):
+    for obj in objs:
+        dump(obj, fp)
+
+
+def iter_load(fp):
+    while True:
+        try:
+            yield load(fp)
+        except EOFError:
+            return
+
+
+def _register_reducer(klass):
+    if klass not in all.CLASSES:
+        # Unregistered.
+        REDUCERS.pop(klass, None)
+    elif str(klass) not in NATIVE_CLASS_NAMES:
+        REDUCERS[klass] = _build_reducer(all.CLASSES[klass])
+
+
+all.register_format(
+    "pickle",
+    dumper=dump,
+    loadser=loads,
+    loader=load,
+    register_class=_register_reducer,
+    dump_many=dump_many,
+    iter_load=iter_load,
+)
+
+
+# The safe subformat only loads builtin types and registered classes
+# (using their from_builtin), so it can be used with untrusted content.
+# Any other global in the pickle raises UnpicklingError.
+
+#: Builtin types that pickle stores as globals (under builtins or,
+#: for protocols < 3, __builtin__).
+SAFE_BUILTINS = ("bytearray", "bytes", "complex", "frozenset", "range", "set", "slice")
+
+# Map (module, name) to the object that a safe unpickler can load,
+# or None for the NATIVE_GLOBALS, imported the first time they are loaded.
+# Built on first use and invalidated when a class is registered.
+_safe_globals = None
+
+
+def _build_safe_globals():
+    out = {}
+    for class_name, names in NATIVE_GLOBALS.items():
+        if class_name in all.CLASSES_BY_NAME or class_name in all.LAZY_CLASSES:
+            out.update(dict.fromkeys(names))
+
+    for name in SAFE_BUILTINS:
+        out[("builtins", name)] = out[("__builtin__", name)] = getattr(builtins, name)
+
+    # Used by protocols < 3 to store bytes and ranges.
+    out[("_codecs", "encode")] = codecs.encode
+    out[("__builtin__", "xrange")] = range
+
+    for klass, helper in all.CLASSES.items():
+        for obj in (klass, helper.from_builtin):
+            module = getattr(obj, "__module__", None)
+            for attr in ("__qualname__", "__name__"):
+                name = getattr(obj, attr, None)
+                if module and name:
+                    out[(module, name)] = obj
+    return out
+
+
+def find_safe_class(module, name):
+    """Return the builtin type or registered class (or its from_builtin)
+    stored as `module`.`name`, raising UnpicklingError for anything else.
+    """
+    global _safe_globals
+    if _safe_globals is None:
+        _safe_globals = _build_safe_globals()
+
+    try:
+        obj = _safe_globals[(module, name)]
+    except KeyError:
+        raise pickle.UnpicklingError(
+            "global '%s.%s' is forbidden in safe mode" % (module, name)
+        ) from None
+
+    if obj is None:
+        obj = getattr(importlib.import_module(module), name)
+        _safe_globals[(module, name)] = obj
+    return obj
+
+
+class SafeUnpickler(pickle.Unpickler):
+    def find_class(self, module, name):
+        return find_safe_class(module, name)
+
+
+def load_safe(fp):
+    return SafeUnpickler(fp).load()
+
+
+def loads_safe(content):
+    return SafeUnpickler(BytesIO(content)).load()
+
+
+def iter_load_safe(fp):
+    while True:
+        try:
+            yield load_safe(fp)
+        except EOFError:
+            return
+
+
+def _register_class(klass):
+    global _safe_globals
+    _safe_globals = None
+
+
+all.register_format(
+    "pickle:safe",
+    dumper=dump,
+    loadser=loads_safe,
+    loader=load_safe,
+    register_class=_register_class,
+    dump_many=dump_many,
+    iter_load=iter_load_safe,
+)
+
+
+# The oob subformat uses protocol 5 to store large buffers (memoryview,
+# array.array, pickle.PickleBuffer, numpy arrays and others supporting it)
+# out of band, after the pickle and aligned:
+#
+#     magic | number of buffers | pickle size | buffer sizes | pickle | buffers
+#
+# Buffers are written without copying them into the pickle stream and are
+# loaded as read-only slices of the content, as pickle.loads does with bytes.
+# Objects that can wrap a buffer (memoryview, numpy arrays) do not copy it,
+# so loading with mmap=True maps them directly to the file. Note that the
+# C pickler always stores bytes and bytearray objects in band; wrap them in
+# a memoryview to store them out of band.
+
+OOB_MAGIC = b"SPB5"
+
+#: Buffers smaller than this number of bytes are stored within the pickle.
+OOB_THRESHOLD = 1 << 16
+
+#: Buffers are aligned to this number of bytes within the content.
+OOB_ALIGNMENT = 64
+
+# magic, number of buffers, size of the pickle.
+_OOB_HEADER = struct.Struct("<4sIQ")
+
+
+def _rebuild_memoryview(buf, fmt, shape):
+    return memoryview(buf).cast("B").cast(fmt, shape)
+
+
+def _rebuild_array(typecode, buf):
+    out = array.array(typecode)
+    out.frombytes(memoryview(buf).cast("B"))
+    return out
+
+
+class OOBPickler(MyPickler):
+    def reducer_override(self, obj):
+        if type(obj) is memoryview:
+            if not obj.c_contiguous:
+                obj = memoryview(obj.tobytes()).cast(obj.format, obj.shape)
+            buf = pickle.PickleBuffer(obj)
+            return _rebuild_memoryview, (buf, obj.format, obj.shape)
+        if type(obj) is array.array:
+            return _rebuild_array, (obj.typecode, pickle.PickleBuffer(obj))
+        return super().reducer_override(obj)
+
+
+def dumps_buffers(obj, threshold=None):
+    """Pickle `obj` using protocol 5 keeping buffers larger than `threshold`
+    (by default, OOB_THRESHOLD) out of band.
+
+    Returns the pickle and a list of pickle.PickleBuffer referencing the memory
+    of the original objects (without copying it). Both must be given to
+    `loads_buffers`, e.g. after sending them to another process.
+    """
+    if threshold is None:
+        threshold = OOB_THRESHOLD
+
+    buffers = []
+
+    def buffer_callback(buf):
+        with buf.raw() as view:
+            if view.nbytes < threshold:
+                # Serialized in band.
+                return True
+        buffers.append(buf)
+
+    fp = BytesIO()
+    OOBPickler(fp, protocol=5, buffer_callback=buffer_callback).dump(obj)
+    return fp.getvalue(), buffers
+
+
+def loads_buffers(data, buffers):
+    """Unpickle the output of `dumps_buffers`.
+
+    `buffers` can be any objects supporting the buffer protocol.
+    """
+    return pickle.loads(data, buffers=buffers)
+
+
+def _oob_parts(data, buffers):
+    views = [buf.raw() for buf in buffers]
+    sizes = [view.nbytes for view in views]
+    header = _OOB_HEADER.pack(OOB_MAGIC, len(sizes), len(data))
+    header += struct.pack("<%dQ" % len(sizes), *sizes)
+
+    yield header
+    yield data
+
+    offset = len(header) + len(data)
+    for view in views:
+        padding = -offset % OOB_ALIGNMENT
+        yield bytes(padding)
+        yield view
+        offset += padding + view.nbytes
+
+
+def dump_oob(obj, fp):
+    for part in _oob_parts(*dumps_buffers(obj)):
+        fp.write(part)
+
+
+def dumps_oob(obj):
+    return b"".join(_oob_parts(*dumps_buffers(obj)))
+
+
+def loads_oob(content):
+    view = memoryview(content).cast("B").toreadonly()
+    if view[: len(OOB_MAGIC)] != OOB_MAGIC:
+        return loads(content)
+
+    _, count, size = _OOB_HEADER.unpack_from(view)
+    offset = _OOB_HEADER.size
+    sizes = struct.unpack_from("<%dQ" % count, view, offset)
+    offset += 8 * count
+
+    data = view[offset : offset + size]
+    offset += size
+
+    buffers = []
+    for size in sizes:
+        offset += -offset % OOB_ALIGNMENT
+        buffers.append(view[offset : offset + size])
+        offset += size
+
+    if offset > len(view):
+        raise ValueError("Truncated pickle:oob content")
+
+    return loads_buffers(data, buffers)
+
+
+def _read_exactly(fp, size):
+    content = fp.read(size)
+    if len(content) < size:
+        raise ValueError("Truncated pickle:oob content")
+    return content
+
+
+def load_oob(fp):
+    header = fp.read(_OOB_HEADER.size)
+    if not header.startswith(OOB_MAGIC):
+        return loads(header + fp.read())
+
+    if len(header) < _OOB_HEADER.size:
+        raise ValueError("Truncated pickle:oob content")
+
+    _, count, size = _OOB_HEADER.unpack(header)
+    sizes = struct.unpack("<%dQ" % count, _read_exactly(fp, 8 * count))
+    data = _read_exactly(fp, size)
+    offset = _OOB_HEADER.size + 8 * count + size
+
+    # Each buffer is read into its own bytearray,
+    # read-only as the buffers loaded from the content.
+    buffers = []
+    for size in sizes:
+        padding = -offset % OOB_ALIGNMENT
+        _read_exactly(fp, padding)
+        buf = bytearray(size)
+        if fp.readinto(buf) < size:
+            raise ValueError("Truncated pickle:oob content")
+        buffers.append(memoryview(buf).toreadonly())
+        offset += padding + size
+
+    return loads_buffers(data, buffers)
+
+
+all.register_format(
+    "pickle:oob",
+    dumps_oob,
+    loads_oob,
+    dump_oob,
+    load_oob,
+)
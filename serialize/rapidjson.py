@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+"""
+    serialize.rapidjson
+    ~~~~~~~~~~~~~~~~~~~
+
+    Fast backend for JSON Serialization.
+
+    See https://github.com/python-rapidjson/python-rapidjson for more details.
+
+    :copyright: (c) 2016 by Hernan E. Grecco.
+    :license: BSD, see LICENSE for more details.
+"""
+
+import rapidjson
+
+from . import all, json
+
+
+def dumps(obj):
+    try:
+        return rapidjson.dumps(
+            all.encode_batches(obj),
+            default=json.default,
+            number_mode=rapidjson.NM_NAN,
+            # bytes are given to the default function.
+            bytes_mode=rapidjson.BM_NONE,
+        ).encode("utf-8")
+    except (TypeError, ValueError, OverflowError):
+        # rapidjson rejects some objects that the standard library
+        # accepts (e.g. non string keys).
+        return json.dumps(obj)
+
+
+def loads(content):
+    if not isinstance(content, (bytes, bytearray, str)):
+        content = str(content, "utf-8")
+    return rapidjson.loads(
+        content, object_hook=all.decode, number_mode=rapidjson.NM_NAN
+    )
+
+
+dump_many, iter_load = json.json_lines(dumps, loads)
+
+all.register_format(
+    "json",
+    dumps,
+    loads,
+    dump_many=dump_many,
+    iter_load=iter_load,
+    backend="rapidjson",
+    priority=20,
+)
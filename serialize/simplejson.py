@@ -68,12 +68,28 @@ def dumps_pretty(obj):
 
 
 def loads(content):
-    obj = json.loads(content.decode("utf-8"), object_hook=all.decode)
+    obj = json.loads(str(content, "utf-8"), object_hook=all.decode)
     return all.traverse_and_decode(obj, decode_func=df)
 
 
+# Multiple objects are stored as JSON Lines (one compact document per line).
+
+
+def dump_many(objs, fp):
+    for obj in objs:
+        fp.write(dumps(obj) + b"\n")
+
+
+def iter_load(fp):
+    for line in fp:
+        if line.strip():
+            yield loads(line)
+
+
 # We create two different subformats for json.
 # The first (default) is compact, the second is pretty.
 
-all.register_format("simplejson", dumps, loads)
+all.register_format(
+    "simplejson", dumps, loads, dump_many=dump_many, iter_load=iter_load
+)
 all.register_format("simplejson:pretty", dumps_pretty, loads)
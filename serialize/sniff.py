@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""
+    serialize.sniff
+    ~~~~~~~~~~~~~~~
+
+    Functions detecting the builtin formats from the first bytes
+    of the content, used by `loads(content, "auto")`.
+
+    They only depend on the layout of each format, so they are registered
+    without importing the format modules or the packages they use.
+
+    :copyright: (c) 2016 by Hernan E. Grecco.
+    :license: BSD, see LICENSE for more details.
+"""
+
+import re
+
+from .all import register_sniffer
+
+# First byte of msgpack maps, arrays, strings, binaries, extensions,
+# nil, booleans and floats. Integers (positive and negative fixints)
+# are left out as they cannot be distinguished from text.
+_MSGPACK_FIRST = frozenset(range(0x80, 0xE0)) - {0xC1}
+
+# Element types that can follow the length of a BSON document.
+_BSON_TYPES = frozenset(range(0x01, 0x14)) | {0x7F, 0xFF}
+
+_PHP = re.compile(rb'(?:a:\d+:\{|O:\d+:"|s:\d+:"|i:-?\d+;|d:[^;]+;|b:[01];|N;)')
+
+_JSON = re.compile(rb'\s*(?:[\[{"]|-?\d|true\b|false\b|null\b)')
+
+
+def is_pickle(head, size):
+    # Protocol 2 and above start with the PROTO opcode.
+    return len(head) >= 2 and head[0] == 0x80 and 2 <= head[1] <= 5
+
+
+def is_dill(head, size):
+    return is_pickle(head, size) and b"dill._dill" in head
+
+
+def is_bson(head, size):
+    if size < 5 or int.from_bytes(head[:4], "little") != size:
+        return False
+    if size == 5:
+        return head[4] == 0
+    return head[4] in _BSON_TYPES
+
+
+def is_msgpack(head, size):
+    return len(head) > 0 and head[0] in _MSGPACK_FIRST
+
+
+def is_json(head, size):
+    return _JSON.match(head) is not None
+
+
+def is_phpserialize(head, size):
+    return _PHP.match(head) is not None
+
+
+def is_yaml(head, size):
+    # Any text that is not detected as another format.
+    return len(head) > 0 and (head[0] >= 0x20 or head[0] in b"\t\n\r")
+
+
+register_sniffer("pickle:oob", lambda head, size: head.startswith(b"SPB5"), 100)
+register_sniffer("serpent", lambda head, size: head.startswith(b"# serpent"), 95)
+register_sniffer(
+    "json:compact", lambda head, size: head.startswith(b'{"__classes__": '), 95
+)
+register_sniffer(
+    "msgpack:compact", lambda head, size: head.startswith(b"\x82\xab__classes__"), 95
+)
+register_sniffer("dill", is_dill, 91)
+register_sniffer("pickle", is_pickle, 90)
+register_sniffer("bson", is_bson, 80)
+register_sniffer("phpserialize", is_phpserialize, 70)
+register_sniffer("msgpack", is_msgpack, 60)
+register_sniffer("json", is_json, 50)
+register_sniffer("yaml", is_yaml, 10)
@@ -0,0 +1,71 @@
+import asyncio
+
+import pytest
+
+from serialize import aio, dump_many, dumps, loads
+
+OBJ = dict(a=1, b=[1.5, "text"], c=dict(d=None))
+
+OBJS = [dict(n=ndx, l=list(range(ndx))) for ndx in range(50)]
+
+
+class MemoryWriter:
+    def __init__(self):
+        self.buf = bytearray()
+        self.drained = 0
+
+    def write(self, data):
+        self.buf += data
+
+    async def drain(self):
+        self.drained += 1
+
+
+def _stream_reader(content):
+    reader = asyncio.StreamReader()
+    reader.feed_data(content)
+    reader.feed_eof()
+    return reader
+
+
+@pytest.mark.parametrize("fmt", ["json", "pickle", "msgpack", "yaml"])
+def test_aio_path(fmt, tmp_path):
+    fn = tmp_path / ("data." + fmt)
+
+    async def main():
+        await aio.dump(OBJ, str(fn))
+        return await aio.load(fn)
+
+    assert asyncio.run(main()) == OBJ
+    assert loads(fn.read_bytes(), fmt) == OBJ
+
+
+@pytest.mark.parametrize("fmt", ["json", "pickle"])
+def test_aio_stream(fmt, monkeypatch):
+    # Force several chunks.
+    monkeypatch.setattr(aio, "CHUNK_SIZE", 16)
+    writer = MemoryWriter()
+
+    async def main():
+        await aio.dump(OBJ, writer, fmt)
+        return await aio.load(_stream_reader(bytes(writer.buf)), fmt)
+
+    assert asyncio.run(main()) == OBJ
+    assert bytes(writer.buf) == dumps(OBJ, fmt)
+    assert writer.drained > 1
+
+
+@pytest.mark.parametrize("fmt", ["json", "pickle", "msgpack", "yaml", "bson"])
+def test_aio_iter_load(fmt, tmp_path):
+    fn = tmp_path / ("data." + fmt)
+    dump_many(OBJS, fn)
+
+    async def main():
+        from_path = [obj async for obj in aio.iter_load(fn)]
+        reader = _stream_reader(fn.read_bytes())
+        from_stream = [obj async for obj in aio.iter_load(reader, fmt)]
+        return from_path, from_stream
+
+    from_path, from_stream = asyncio.run(main())
+    assert from_path == OBJS
+    assert from_stream == OBJS
@@ -0,0 +1,125 @@
+import array
+import pathlib
+import subprocess
+import sys
+
+import pytest
+
+from serialize import dumps, loads
+from serialize.all import _get_format
+
+FORMATS = [
+    "bson",
+    "dill",
+    "dill:safe",
+    "json",
+    "json:compact",
+    "msgpack",
+    "msgpack:compact",
+    "pickle",
+    "pickle:oob",
+    "pickle:safe",
+    "serpent",
+    "yaml",
+    "yaml:safe",
+    "yaml:legacy",
+]
+
+
+def _round_trip(obj, fmt):
+    try:
+        _get_format(fmt)
+    except ValueError:
+        pytest.skip("%s is not available" % fmt)
+    return loads(dumps(dict(value=obj), fmt), fmt)["value"]
+
+
+@pytest.mark.parametrize("fmt", FORMATS)
+def test_array(fmt):
+    for obj in (array.array("d", [1.5, -2.0]), array.array("b"), array.array("u", "x")):
+        loaded = _round_trip(obj, fmt)
+        assert type(loaded) is array.array
+        assert loaded == obj
+
+
+@pytest.mark.parametrize("fmt", FORMATS)
+def test_ndarray(fmt):
+    np = pytest.importorskip("numpy")
+
+    base = np.arange(24, dtype=">i4").reshape(2, 3, 4)
+    objs = (
+        base,
+        np.asfortranarray(base),
+        base[:, ::2, 1:].T,
+        np.array(3.5, dtype=np.float32),
+        np.zeros((0, 3), dtype=np.complex128),
+        np.array([(1, (2.0, 3.0))], dtype=[("a", "<i2"), ("b", "<f8", 2)]),
+        np.array([True, False]),
+    )
+    for obj in objs:
+        loaded = _round_trip(obj, fmt)
+        assert type(loaded) is np.ndarray
+        if fmt.split(":")[0] not in ("dill", "pickle"):
+            # numpy pickles big endian arrays in native order below protocol 5.
+            assert loaded.dtype == obj.dtype
+        assert loaded.shape == obj.shape
+        assert np.array_equal(loaded, obj)
+
+
+@pytest.mark.parametrize("fmt", ["json", "msgpack"])
+def test_ndarray_size(fmt):
+    np = pytest.importorskip("numpy")
+
+    obj = np.linspace(0, 1, 10000)
+    content = dumps(obj, fmt)
+    assert len(content) < len(dumps(obj.tolist(), fmt))
+    if fmt == "msgpack":
+        assert len(content) < obj.nbytes + 100
+
+
+def test_ndarray_objects():
+    np = pytest.importorskip("numpy")
+
+    with pytest.raises(ValueError, match="Python objects"):
+        dumps(np.array([1, "a"], dtype=object), "json")
+
+
+@pytest.mark.parametrize("fmt", ["json", "json:compact", "json:pretty"])
+def test_bytes_json(fmt):
+    # Only the buffers of arrays are stored as base64.
+    for obj in (b"\x00\xff", dict(b=[bytearray(b"12")]), memoryview(b"34")):
+        with pytest.raises(TypeError, match="not JSON serializable"):
+            dumps(obj, fmt)
+
+    obj = dict(a=array.array("b", [1, -1]), b=[array.array("d")])
+    assert loads(dumps(obj, fmt), fmt) == obj
+
+
+def test_arrays_lazy():
+    np = pytest.importorskip("numpy")
+
+    # numpy is only imported by serialize to decode an array.
+    content = dumps(np.arange(3), "json")
+    code = (
+        "import sys, serialize; "
+        "print('numpy' in sys.modules); "
+        "print(repr(serialize.loads(%r, 'json')))" % content
+    )
+    root = pathlib.Path(__file__).parents[2]
+    out = subprocess.check_output([sys.executable, "-c", code], cwd=root)
+    assert out.split() == [b"False", b"array([0,", b"1,", b"2])"]
+
+
+def test_arrays_user_handler():
+    pytest.importorskip("numpy")
+
+    # Importing the lazy module for array.array keeps the ndarray handler.
+    code = (
+        "import array, numpy, serialize; "
+        "serialize.register_class(numpy.ndarray, lambda a: a.tolist(), numpy.array); "
+        "serialize.dumps(array.array('b', [1]), 'json'); "
+        "print(serialize.dumps(numpy.arange(3), 'json'))"
+    )
+    root = pathlib.Path(__file__).parents[2]
+    out = subprocess.check_output([sys.executable, "-c", code], cwd=root)
+    assert b"[0,1,2]" in out
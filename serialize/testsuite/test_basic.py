@@ -1,17 +1,37 @@
+import enum
 import io
+import math
 import os
 import pathlib
+import subprocess
 import sys
+import uuid
 
 import pytest
 
-from serialize import dump, dumps, load, loads, register_class
+from serialize import (
+    dump,
+    dump_many,
+    dumps,
+    iter_load,
+    load,
+    load_path,
+    loads,
+    register_class,
+)
 from serialize.all import (
+    BACKENDS,
     FORMATS,
     UNAVAILABLE_FORMATS,
     _get_format,
     _get_format_from_ext,
+    encode,
     register_format,
+    register_lazy_format,
+    select_backend,
+    traverse_and_decode,
+    traverse_and_encode,
+    unregister_class,
     unregister_format,
 )
 
@@ -47,6 +67,23 @@ def from_builtin(content):
 register_class(X, to_builtin, from_builtin)
 
 
+class Color(enum.Enum):
+    RED = 1
+    BLUE = 2
+
+
+@pytest.fixture
+def native_classes():
+    # Classes that some backends serialize natively, without calling back.
+    # Registered only for the tests using them, as this changes how
+    # these backends dump any object.
+    register_class(Color, lambda obj: obj.value, Color)
+    register_class(uuid.UUID, str, uuid.UUID)
+    yield
+    unregister_class(Color)
+    unregister_class(uuid.UUID)
+
+
 @pytest.mark.parametrize("fmt", FORMATS)
 def test_available(fmt):
     assert fmt not in UNAVAILABLE_FORMATS
@@ -60,6 +97,83 @@ def test_unknown_format():
         dumps("hello", "dummy_format")
 
 
+def test_missing_format():
+    with pytest.raises(ValueError, match="unknown format"):
+        dumps("hello", None)
+
+    with pytest.raises(ValueError, match="unknown format"):
+        load(io.BytesIO(b"1"))
+
+    with pytest.raises(ValueError, match="unknown format"):
+        load_path(io.BytesIO(b"1"), None, ("a",))
+
+
+def test_lazy_import():
+    code = (
+        "import sys, serialize; "
+        "print(sorted(set(sys.modules) & {'yaml', 'msgpack', 'dill', 'serpent'}))"
+    )
+    root = pathlib.Path(__file__).parents[2]
+    out = subprocess.check_output([sys.executable, "-c", code], cwd=root)
+    assert out.strip() == b"[]"
+
+
+def test_lazy_unavailable():
+    register_lazy_format("_lazy1", ".dummy", requires="_not_a_package")
+    assert "_lazy1" not in FORMATS
+    assert "_not_a_package" in UNAVAILABLE_FORMATS.pop("_lazy1").msg
+
+    register_lazy_format("_lazy2", "._not_a_module", extension=None)
+    assert "_lazy2" in FORMATS
+    with pytest.raises(ValueError, match="unavailable"):
+        dumps("hello", "_lazy2")
+    assert "_lazy2" not in FORMATS
+    del UNAVAILABLE_FORMATS["_lazy2"]
+
+
+def test_encode_dispatch():
+    class Base:
+        pass
+
+    class Derived(Base):
+        pass
+
+    obj = Derived()
+
+    # Not registered, the object is returned untouched.
+    assert encode(obj) is obj
+
+    # The cached negative lookup is invalidated by register_class.
+    register_class(Base, lambda o: "base", Base)
+    assert encode(obj)["__dumped_obj__"] == "base"
+    assert encode(obj)["__class_name__"] == str(Derived)
+
+    # The exact type wins over the base class.
+    register_class(Derived, lambda o: "derived", Derived)
+    assert encode(obj)["__dumped_obj__"] == "derived"
+    assert encode(Base())["__dumped_obj__"] == "base"
+
+
+def test_traverse_deeply_nested():
+    depth = 10 * sys.getrecursionlimit()
+
+    obj = leaf = []
+    for _ in range(depth):
+        child = []
+        leaf.append({"x": X(1, 2), "y": (1,), "z": child})
+        leaf = child
+
+    encoded = traverse_and_encode(obj)
+    assert encoded[0]["x"]["__dumped_obj__"] == (1, 2)
+
+    decoded = traverse_and_decode(encoded)
+    for _ in range(depth):
+        assert decoded[0]["x"] == X(1, 2)
+        assert decoded[0]["y"] == (1,)
+        decoded = decoded[0]["z"]
+    assert decoded == []
+
+
 NESTED_DICT = {
     "level1_1": {"level2_1": [1, 2, 3], "level2_2": [4, 5, 6]},
     "level1_2": {"level2_1": [1, 2, 3], "level2_2": [4, 5, 6]},
@@ -116,6 +230,231 @@ def test_round_trip(obj, fmt):
     assert len(record) == 0
 
 
+@pytest.mark.parametrize("fmt", FORMATS)
+def test_buffers(fmt):
+    if fmt == "_test" or fmt == "dill":
+        return
+
+    obj = dict(a=X(3, 4), b=[1, 2, 3], c="hello")
+    dumped = dumps(obj, fmt)
+
+    assert obj == loads(bytearray(dumped), fmt)
+    assert obj == loads(memoryview(dumped), fmt)
+
+    fh = _get_format(fmt)
+    filename = pathlib.Path("tmp_mmap." + fh.extension)
+    try:
+        dump(obj, filename, fmt)
+        assert obj == load(filename, fmt, mmap=True)
+        with filename.open("rb") as fp:
+            assert obj == load(fp, fmt, mmap=True)
+    finally:
+        filename.unlink()
+
+    # Files that cannot be mapped are read as usual.
+    assert obj == load(io.BytesIO(dumped), fmt, mmap=True)
+
+
+@pytest.mark.parametrize("fmt", FORMATS)
+def test_many_round_trip(fmt):
+    if fmt == "_test" or fmt == "dill":
+        return
+
+    objs = VALUES[1:]
+
+    buf = io.BytesIO()
+    dump_many(iter(objs), buf, fmt)
+    buf.seek(0)
+
+    it = iter_load(buf, fmt)
+    assert next(it) == objs[0]
+    assert list(it) == objs[1:]
+
+    fh = _get_format(fmt)
+    filename = pathlib.Path("tmp_many." + fh.extension)
+    try:
+        dump_many(objs, filename, fmt)
+        assert list(iter_load(filename, fmt)) == objs
+    finally:
+        filename.unlink()
+
+
+@pytest.mark.parametrize("fmt", ["json", "msgpack"])
+def test_compact(fmt):
+    compact = fmt + ":compact"
+    obj = dict(a=[X(ndx, X(0, ndx)) for ndx in range(10)], b="text")
+
+    dumped = dumps(obj, compact)
+    assert len(dumped) < len(dumps(obj, fmt)) / 2
+    assert loads(dumped, compact) == obj
+
+    # Verbose documents are still read.
+    assert loads(dumps(obj, fmt), compact) == obj
+
+    # No class table is written if there are no registered classes.
+    dumped = dumps(NESTED_DICT, compact)
+    assert b"__classes__" not in dumped
+    assert loads(dumped, fmt) == NESTED_DICT
+
+    # Documents looking like an envelope are stored in one.
+    for obj in (
+        {"__classes__": [], "__root__": 1},
+        {"__classes__": ["<class 'int'>"], "__root__": {"__c__": 0, "__o__": 1}},
+        {"__classes__": [], "__root__": X(1, 2)},
+    ):
+        assert loads(dumps(obj, compact), compact) == obj
+
+
+def test_msgpack_ext_type():
+    msgpack = pytest.importorskip("msgpack")
+
+    obj = dict(a=X(1, X(2, 3)), b=[dict(c=1)])
+    dumped = dumps(obj, "msgpack")
+    assert b"__class_name__" not in dumped
+    assert loads(dumped, "msgpack") == obj
+
+    # Classes encoded as maps by previous versions are still read.
+    legacy = msgpack.packb(obj, default=encode)
+    assert loads(legacy, "msgpack") == obj
+    assert list(iter_load(io.BytesIO(legacy), "msgpack")) == [obj]
+
+    # Other extension types are left as they are.
+    ext = msgpack.ExtType(42, b"data")
+    assert loads(msgpack.packb(ext), "msgpack") == ext
+
+
+def test_json_without_envelope(monkeypatch):
+    import serialize.all
+    from serialize.json import loads as json_loads
+
+    # The object_hook is not used if there are no registered classes.
+    monkeypatch.setattr(serialize.all, "decode", pytest.fail)
+    assert json_loads(b'{"a": {"b": [1, {}]}}') == {"a": {"b": [1, {}]}}
+    assert json_loads(memoryview(b'{"a": {}}')) == {"a": {}}
+    # Non-ASCII characters escaped by the standard library.
+    assert json_loads(b'{"\\u00e9": 1}') == {"\u00e9": 1}
+
+
+def test_yaml_libyaml():
+    yaml = pytest.importorskip("yaml")
+    from serialize import yaml as yaml_module
+
+    if yaml.__with_libyaml__:
+        assert issubclass(yaml_module.Loader, yaml.CLoader)
+        assert issubclass(yaml_module.Dumper, yaml.CDumper)
+    else:
+        assert issubclass(yaml_module.Loader, yaml.Loader)
+        assert issubclass(yaml_module.Dumper, yaml.Dumper)
+
+
+# Import the modules of all formats, so that all backends are registered.
+for fmt in list(FORMATS):
+    _get_format(fmt)
+
+BACKEND_PARAMS = [(fmt, backend) for fmt in BACKENDS for backend in BACKENDS[fmt]]
+
+
+# Objects that some backends serialize differently.
+BACKEND_VALUES = VALUES + [[float("nan"), float("inf"), -float("inf")]]
+
+NATIVE_VALUES = [Color.BLUE, dict(color=Color.RED, ids=[uuid.UUID(int=7)])]
+
+
+def _same(obj, other):
+    # NaN is not equal to itself.
+    if isinstance(obj, list) and isinstance(other, list):
+        return len(obj) == len(other) and all(map(_same, obj, other))
+    if isinstance(obj, float) and math.isnan(obj):
+        return isinstance(other, float) and math.isnan(other)
+    return type(obj) is type(other) and obj == other
+
+
+def _check_backend(obj, fmt, backend):
+    select_backend(fmt, backend)
+    try:
+        assert FORMATS[fmt] is BACKENDS[fmt][backend].format
+        dumped = dumps(obj, fmt)
+        assert _same(obj, loads(dumped, fmt))
+
+        buf = io.BytesIO()
+        dump(obj, buf, fmt)
+        assert dumped == buf.getvalue()
+
+        # Payloads are interchangeable among backends.
+        for other in BACKENDS[fmt].values():
+            assert _same(obj, other.format.loads(dumped))
+    finally:
+        select_backend(fmt)
+
+
+@pytest.mark.parametrize("obj", BACKEND_VALUES)
+@pytest.mark.parametrize("fmt,backend", BACKEND_PARAMS)
+def test_backend_round_trip(obj, fmt, backend):
+    _check_backend(obj, fmt, backend)
+
+
+@pytest.mark.parametrize("obj", NATIVE_VALUES)
+@pytest.mark.parametrize("fmt,backend", BACKEND_PARAMS)
+def test_backend_native(obj, fmt, backend, native_classes):
+    _check_backend(obj, fmt, backend)
+
+
+def test_orjson_fallback():
+    pytest.importorskip("orjson")
+    from serialize import orjson as orjson_module
+
+    # Without registered enums or UUIDs, orjson encodes the content.
+    assert not orjson_module._NATIVE_REGISTERED
+    content = orjson_module.dumps([1, X(1, 2), "text"])
+    assert content.startswith(b'[1,{"__class_name__":')
+    assert content == orjson_module.orjson.dumps(
+        [1, encode(X(1, 2)), "text"], option=orjson_module.OPTIONS
+    )
+
+    # The standard library is used for content with null, which might
+    # come from NaN or Infinity.
+    dumped = orjson_module.dumps([float("nan"), None])
+    assert _same([float("nan"), None], orjson_module.loads(dumped))
+
+
+def test_orjson_native_classes(native_classes):
+    pytest.importorskip("orjson")
+    from serialize import orjson as orjson_module
+
+    # Registering Color (an Enum) makes the backend use the standard library.
+    assert Color in orjson_module._NATIVE_REGISTERED
+    content = orjson_module.dumps(Color.RED)
+    assert content == BACKENDS["json"]["json"].format.dumps(Color.RED)
+
+
+def test_orjson_priority():
+    pytest.importorskip("orjson")
+    # orjson is only used if selected.
+    assert FORMATS["json"] is not BACKENDS["json"]["orjson"].format
+
+
+@pytest.mark.parametrize("backend", BACKENDS["json"])
+def test_json_escaped_envelope(backend):
+    # The key of the envelope written with an escape sequence.
+    content = dumps(X(1, 2), "json").replace(b"__class_", b"\\u005f_class_")
+    select_backend("json", backend)
+    try:
+        assert loads(content, "json") == X(1, 2)
+    finally:
+        select_backend("json")
+
+
+def test_select_backend():
+    with pytest.raises(ValueError):
+        select_backend("json", "_not_a_backend")
+
+    select_backend("json", "json")
+    assert FORMATS["json"] is BACKENDS["json"]["json"].format
+    select_backend("json")
+    best = max(BACKENDS["json"].values(), key=lambda b: b.priority)
+    assert FORMATS["json"] is best.format
+
+
 @pytest.mark.parametrize("fmt", FORMATS)
 def test_file_by_name(fmt):
     if fmt == "_test":
@@ -311,9 +650,206 @@ def test_reduce(fmt, klass1, klass2):
     if fmt == "yaml:legacy" or fmt == "_test" or fmt == "dill":
         return
 
+    # Safe formats do not load arbitrary classes by design (see test_safe).
+    if fmt.endswith(":safe"):
+        return
+
     a = klass1(a=1, b=2, c=dict(d=3, e=4))
     _test_round_trip(a, fmt)
 
     b = klass2(f=8, g=9, h=dict(i=9, j=10))
     a["B"] = b
     _test_round_trip(b, fmt)
+
+
+class Z(X):
+    pass
+
+
+def z_from_builtin(content):
+    return Z(*content)
+
+
+@pytest.mark.parametrize("fmt", ["pickle", "dill", "yaml"])
+def test_safe(fmt):
+    safe = fmt + ":safe"
+    if safe not in FORMATS or fmt in UNAVAILABLE_FORMATS:
+        pytest.skip("%s is not available" % fmt)
+
+    obj = dict(a=X(1, 2), b=[1.5, "text", b"bytes", None], c={1, 2}, d=1j)
+    if fmt == "yaml":
+        # Not part of safe YAML.
+        del obj["c"], obj["d"]
+
+    if fmt != "yaml":
+        # yaml uses python specific tags (e.g. for tuples).
+        assert loads(dumps(obj, fmt), safe) == obj
+    assert loads(dumps(obj, safe), safe) == obj
+
+    # Classes registered after the format was loaded are also allowed.
+    register_class(Z, to_builtin, z_from_builtin)
+    assert loads(dumps(dict(z=Z(3, 4)), safe), safe) == dict(z=Z(3, 4))
+
+    # Unregistered classes are not loaded.
+    unsafe = dumps(Reduce_2(a=1), fmt)
+    with pytest.raises(Exception, match="forbidden|could not determine a constructor"):
+        loads(unsafe, safe)
+
+
+def test_safe_pickle_globals():
+    import pickle
+
+    for protocol in range(pickle.HIGHEST_PROTOCOL + 1):
+        obj = [b"bytes", bytearray(b"array"), {1}, frozenset({2}), 1j, range(3)]
+        assert loads(pickle.dumps(obj, protocol), "pickle:safe") == obj
+
+    evil = b"cos\nsystem\n(S'echo hello'\ntR."
+    with pytest.raises(pickle.UnpicklingError, match="os.system"):
+        loads(evil, "pickle:safe")
+
+
+def test_pickle_oob(tmp_path):
+    import array
+
+    from serialize.pickle import OOB_THRESHOLD, dumps_buffers, loads_buffers
+
+    size = 2 * OOB_THRESHOLD
+    obj = dict(
+        a=memoryview(b"a" * size),
+        b=array.array("d", range(size)),
+        c=memoryview(bytearray(b"c" * size)).cast("I"),
+        d=[bytearray(b"small"), X(1, 2)],
+    )
+
+    data, buffers = dumps_buffers(obj)
+    assert len(buffers) == 3
+    assert len(data) < OOB_THRESHOLD
+    assert loads_buffers(data, buffers) == obj
+
+    dumped = dumps(obj, "pickle:oob")
+    loaded = loads(dumped, "pickle:oob")
+    assert loaded == obj
+    assert loaded["c"].format == "I"
+
+    # Buffers are loaded without copying them.
+    assert loaded["c"].obj is not None
+    assert bytes(loaded["c"].obj) == bytes(dumped)
+
+    filename = tmp_path / "data.pickle"
+    dump(obj, filename, "pickle:oob")
+    assert load(filename, "pickle:oob") == obj
+    assert load(filename, "pickle:oob", mmap=True) == obj
+
+    # Buffers are read-only, whether they are loaded from content or files.
+    for loaded in (
+        loads(dumped, "pickle:oob"),
+        loads(bytearray(dumped), "pickle:oob"),
+        load(filename, "pickle:oob"),
+        load(filename, "pickle:oob", mmap=True),
+    ):
+        assert loaded["a"].readonly
+        assert loaded["c"].readonly
+
+    # Regular pickles are also read.
+    assert loads(dumps(obj["d"], "pickle"), "pickle:oob") == obj["d"]
+
+
+def test_pickle_oob_numpy(tmp_path):
+    np = pytest.importorskip("numpy")
+
+    arr = np.arange(100000, dtype="float64").reshape(1000, 100)
+    dumped = dumps(dict(arr=arr), "pickle:oob")
+    loaded = loads(dumped, "pickle:oob")["arr"]
+    np.testing.assert_array_equal(loaded, arr)
+    assert not loaded.flags.writeable
+
+    filename = tmp_path / "data.pickle"
+    dump(dict(arr=arr), filename, "pickle:oob")
+    assert not load(filename, "pickle:oob")["arr"].flags.writeable
+
+    # The array uses the memory of the content (aligned).
+    offset = loaded.ctypes.data - np.frombuffer(dumped, "u1").ctypes.data
+    assert 0 < offset < len(dumped)
+    assert offset % 64 == 0
+
+
+def test_pickle_reducers():
+    from serialize.pickle import DISPATCH_TABLE
+
+    # Reducers are built once per registered class.
+    reducer = DISPATCH_TABLE.get(X)
+    assert reducer is DISPATCH_TABLE[X]
+    assert reducer(X(1, 2)) == (from_builtin, ((1, 2),))
+
+    assert DISPATCH_TABLE.get(Reduce_2) is None
+    with pytest.raises(KeyError):
+        DISPATCH_TABLE[Reduce_2]
+
+    try:
+        from serialize.dill import MyPickler
+    except ImportError:
+        return
+    assert MyPickler.dispatch_table is DISPATCH_TABLE
+
+
+SNIFF_FORMATS = [
+    "bson",
+    "json",
+    "json:compact",
+    "msgpack",
+    "msgpack:compact",
+    "phpserialize",
+    "pickle",
+    "pickle:oob",
+    "serpent",
+    "yaml",
+]
+
+
+@pytest.mark.parametrize("fmt", SNIFF_FORMATS)
+def test_auto_format(fmt, tmp_path):
+    from serialize.all import sniff_format
+
+    try:
+        _get_format(fmt)
+    except ValueError:
+        pytest.skip("%s is not available" % fmt)
+
+    assert sniff_format(dumps(dict(a=X(3, 4), b=[X(1, 2)]), fmt)) == fmt
+
+    # Documents (not scalars) are detected. Content that is valid in more
+    # than one format (e.g. `{}`) can be detected as any of them.
+    for obj in (NESTED_DICT, dict(a=X(3, 4), b=[X(1, 2)]), dict(), [1, 2, 3]):
+        if fmt == "bson" and not isinstance(obj, dict):
+            continue
+
+        dumped = dumps(obj, fmt)
+        assert loads(dumped, "auto") == obj
+        assert loads(memoryview(dumped), "auto") == obj
+
+        assert load(io.BytesIO(dumped), "auto") == obj
+
+        filename = tmp_path / "data.bin"
+        filename.write_bytes(dumped)
+        assert load(filename, "auto") == obj
+        assert load(filename, "auto", mmap=True) == obj
+
+
+def test_auto_format_unknown():
+    with pytest.raises(ValueError, match="could not be detected"):
+        loads(b"\x00\x01", "auto")
+
+
+def test_auto_format_not_seekable():
+    class Stream(io.RawIOBase):
+        def __init__(self, content):
+            self._content = io.BytesIO(content)
+
+        def readable(self):
+            return True
+
+        def readinto(self, buffer):
+            return self._content.readinto(buffer)
+
+    obj = dict(a=X(3, 4), b=[1, 2])
+    assert load(Stream(dumps(obj, "msgpack")), "auto") == obj
@@ -0,0 +1,132 @@
+import pytest
+
+from serialize import dumps, dumps_batch, loads, loads_batch, register_class
+from serialize.all import (
+    BATCH_CLASSES,
+    SELECTED_BACKENDS,
+    select_backend,
+    unregister_class,
+)
+from serialize.batch import _picklable_classes
+
+
+class Point:
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
+
+    def __eq__(self, other):
+        return (
+            self.__class__ is other.__class__
+            and self.x == other.x
+            and self.y == other.y
+        )
+
+
+def point_to_builtin(obj):
+    return [obj.x, obj.y]
+
+
+def point_from_builtin(content):
+    return Point(*content)
+
+
+register_class(Point, point_to_builtin, point_from_builtin)
+
+
+OBJS = [dict(n=ndx, p=Point(ndx, -ndx), l=list(range(ndx % 5))) for ndx in range(100)]
+
+
+@pytest.mark.parametrize("executor", ["thread", "process"])
+@pytest.mark.parametrize("fmt", ["json", "pickle"])
+def test_batch_round_trip(fmt, executor):
+    dumped = dumps_batch(OBJS, fmt, workers=2, executor=executor)
+    assert dumped == [dumps(obj, fmt) for obj in OBJS]
+
+    loaded = loads_batch(iter(dumped), fmt, workers=2, executor=executor)
+    assert loaded == OBJS
+
+
+class Pair:
+    def __init__(self, a, b):
+        self.a = a
+        self.b = b
+
+    def __eq__(self, other):
+        return self.__class__ is other.__class__ and vars(self) == vars(other)
+
+
+def pair_to_builtin(obj):
+    return [obj.a, obj.b]
+
+
+def pair_from_builtin(content):
+    return Pair(*content)
+
+
+def pairs_to_builtin(objs):
+    return dict(a=[obj.a for obj in objs], b=[obj.b for obj in objs])
+
+
+def pairs_from_builtin(content):
+    return [Pair(a, b) for a, b in zip(content["a"], content["b"])]
+
+
+register_class(
+    Pair, pair_to_builtin, pair_from_builtin, pairs_to_builtin, pairs_from_builtin
+)
+
+
+class Local:
+    pass
+
+
+@pytest.fixture
+def local_class():
+    # Cannot be pickled.
+    register_class(Local, lambda obj: None, lambda content: Local())
+    yield Local
+    unregister_class(Local)
+
+
+def test_batch_small():
+    # Too few objects to use a pool.
+    assert dumps_batch(OBJS[:3], "json") == [dumps(obj, "json") for obj in OBJS[:3]]
+    assert loads_batch([], "json") == []
+
+    with pytest.raises(ValueError):
+        dumps_batch(OBJS[:3], "json", executor="bad")
+
+
+def test_batch_workers_state(monkeypatch, local_class):
+    select_backend("json", "json")
+    try:
+        objs = [[Pair(ndx, -ndx)] * 3 for ndx in range(40)]
+        dumped = dumps_batch(objs, "json", workers=2, executor="process")
+        assert dumped == [dumps(obj, "json") for obj in objs]
+        assert loads_batch(dumped, "json", workers=2) == objs
+
+        # Sent to workers that are not forked.
+        monkeypatch.setattr("multiprocessing.get_start_method", lambda: "spawn")
+        with pytest.warns(UserWarning, match="Local"):
+            classes = _picklable_classes()
+        assert (Point, (point_to_builtin, point_from_builtin), None) in classes
+        batch = BATCH_CLASSES[Pair]
+        assert (Pair, (pair_to_builtin, pair_from_builtin), batch) in classes
+        assert SELECTED_BACKENDS == {"json": "json"}
+    finally:
+        select_backend("json")
+
+
+def test_batch_executor():
+    from concurrent.futures import ThreadPoolExecutor
+
+    with ThreadPoolExecutor(2) as pool:
+        dumped = dumps_batch(OBJS, "json", workers=2, executor=pool, chunksize=10)
+    assert [loads(d, "json") for d in dumped] == OBJS
+
+    with pytest.raises(ValueError):
+        dumps_batch(OBJS, "json", workers=2, executor="bad")
+
+    with pytest.raises(ValueError):
+        dumps_batch(OBJS, "_not_a_format")
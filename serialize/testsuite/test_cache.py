@@ -0,0 +1,100 @@
+import threading
+
+from serialize import dumps
+from serialize.all import BACKENDS, _get_format, get_backend, select_backend
+from serialize.cache import SerializationCache
+
+OBJ = dict(a=[1, 2, 3], b="text")
+
+
+def test_cache_dumps():
+    cache = SerializationCache()
+
+    content = cache.dumps(OBJ, "json")
+    assert content == dumps(OBJ, "json")
+    assert cache.dumps(OBJ, "json") is content
+
+    # Other formats and versions are different entries.
+    assert cache.dumps(OBJ, "pickle") == dumps(OBJ, "pickle")
+    assert cache.dumps(OBJ, "json", version=2) is not content
+
+    stats = cache.stats()
+    assert (stats.hits, stats.misses, stats.entries) == (1, 3, 3)
+
+
+def test_cache_loads():
+    cache = SerializationCache()
+    content = dumps(OBJ, "json")
+
+    obj = cache.loads(content, "json")
+    assert obj == OBJ
+    assert cache.loads(bytearray(content), "json") is obj
+    assert cache.loads(dumps([1], "json"), "json") == [1]
+
+    stats = cache.stats()
+    assert (stats.hits, stats.misses) == (1, 2)
+
+    cache.clear()
+    assert cache.stats() == (0, 0, 0, 0, 0)
+
+
+def test_cache_eviction():
+    cache = SerializationCache(max_entries=2)
+    objs = [[ndx] for ndx in range(3)]
+    for obj in objs:
+        cache.dumps(obj, "json")
+
+    stats = cache.stats()
+    assert (stats.entries, stats.evictions) == (2, 1)
+
+    # The least recently used entry was evicted.
+    cache.dumps(objs[0], "json")
+    assert cache.stats().misses == 4
+
+    size = len(dumps(objs[0], "json"))
+    cache = SerializationCache(max_bytes=2 * size)
+    for obj in objs:
+        cache.dumps(obj, "json")
+    assert cache.stats().nbytes == 2 * size
+
+    # Entries larger than max_bytes are not stored.
+    cache.dumps(list(range(100)), "json")
+    assert cache.stats().entries == 2
+
+
+def test_cache_threads():
+    cache = SerializationCache(max_entries=8)
+    objs = [dict(n=ndx) for ndx in range(16)]
+
+    def work():
+        for _ in range(50):
+            for obj in objs:
+                assert cache.loads(cache.dumps(obj, "json"), "json") == obj
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    stats = cache.stats()
+    assert stats.entries == 8
+    assert stats.hits + stats.misses == 4 * 50 * 16 * 2
+
+
+def test_cache_backends():
+    _get_format("json")
+    cache = SerializationCache()
+    try:
+        for backend in BACKENDS["json"]:
+            select_backend("json", backend)
+            assert get_backend("json") == backend
+            assert get_backend("json+gzip") == backend
+            # Backends might give different output.
+            assert cache.dumps(OBJ, "json") == dumps(OBJ, "json")
+            assert cache.loads(dumps(OBJ, "json"), "json") == OBJ
+    finally:
+        select_backend("json")
+
+    assert cache.stats().hits == 0
+    assert get_backend("pickle") is None
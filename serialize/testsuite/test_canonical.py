@@ -0,0 +1,133 @@
+import array
+import hashlib
+import io
+import tracemalloc
+
+import pytest
+
+from serialize import digest, dump, dumps, loads, register_class
+from serialize.all import _get_format, canonical
+
+
+class Tags(frozenset):
+    pass
+
+
+class Box:
+    def __init__(self, content):
+        self.content = content
+
+    def __eq__(self, other):
+        return isinstance(other, Box) and self.content == other.content
+
+
+register_class(Tags, list, Tags)
+register_class(Box, lambda obj: dict(content=obj.content), lambda d: Box(d["content"]))
+
+FMTS = ["json:canonical", "msgpack:canonical", "bson:canonical"]
+
+
+@pytest.fixture(params=FMTS)
+def fmt(request):
+    try:
+        _get_format(request.param)
+    except ValueError as ex:
+        pytest.skip(str(ex))
+    return request.param
+
+
+def _pair():
+    first = dict(b=[1, 2.5, dict(y=1, x=2)], a="é", c=Box(dict(q=1, p=-0.0)))
+    second = dict(c=Box(dict(p=0.0, q=1)), a="é", b=[1, 2.5, dict(x=2, y=1)])
+    return first, second
+
+
+def test_canonical(fmt):
+    first, second = _pair()
+    assert list(first) != list(second)
+
+    content = dumps(first, fmt)
+    assert content == dumps(second, fmt)
+    assert loads(content, fmt) == first
+
+    # Top level objects that are not dicts.
+    for obj in ([second, "x"], "text", 3.5):
+        assert loads(dumps(obj, fmt), fmt) == obj
+
+
+def test_canonical_dump(fmt):
+    first, second = _pair()
+    for obj in (first, [first, -0.0], (), 1):
+        buf = io.BytesIO()
+        dump(obj, buf, fmt)
+        assert buf.getvalue() == dumps(obj, fmt)
+
+
+def test_canonical_digest(fmt):
+    first, second = _pair()
+    expected = hashlib.sha256(dumps(first, fmt)).hexdigest()
+    assert digest(first, fmt) == expected
+    assert digest(second, fmt) == expected
+    assert digest([first], fmt) != expected
+
+    expected = hashlib.blake2b(dumps(first, fmt)).hexdigest()
+    assert digest(second, fmt, "blake2b") == expected
+
+
+def test_canonical_json_keys():
+    content = dumps({10: "a", 9: "b", 1.5: None, True: 1}, "json:canonical")
+    assert content == b'{"1.5":null,"10":"a","9":"b","true":1}'
+
+    # Keys are loaded as strings, which are sorted in the same order.
+    obj = {10: "a", 9: "b", "x": [{2: -0.0, 11: Box({1: 1, 0: 0})}]}
+    content = dumps(obj, "json:canonical")
+    assert dumps(loads(content, "json:canonical"), "json:canonical") == content
+
+    with pytest.raises(TypeError):
+        dumps({(1, 2): 1}, "json:canonical")
+    with pytest.raises(TypeError):
+        dumps([b"bytes"], "json:canonical")
+
+    obj = dict(values=array.array("d", [0.5, -0.0]))
+    assert loads(dumps(obj, "json:canonical"), "json:canonical") == obj
+
+
+def test_canonical_streaming(fmt):
+    if fmt == "bson:canonical":
+        pytest.skip("bson:canonical does not stream")
+
+    obj = dict(values=[dict(n=ndx, text="%08d" % ndx * 100) for ndx in range(4000)])
+    size = len(dumps(obj, fmt))
+
+    tracemalloc.start()
+    try:
+        value = digest(obj, fmt)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    assert value == hashlib.sha256(dumps(obj, fmt)).hexdigest()
+    assert peak < size / 8
+
+
+def test_canonical_sets():
+    tags = Tags(["delta", "alpha", "charlie", "bravo"])
+    content = dumps(dict(tags=tags), "json:canonical")
+    assert b'["alpha","bravo","charlie","delta"]' in content
+    assert loads(content, "json:canonical") == dict(tags=tags)
+
+    # Elements that cannot be compared among them.
+    mixed = canonical(Tags([2, "a", (1,), 1.5]))
+    assert mixed["__dumped_obj__"] == [1.5, 2, "a", (1,)]
+
+
+def test_canonical_builtin():
+    assert list(canonical({"b": 1, 2: 2, "a": 3, 1.5: 4})) == [1.5, 2, "a", "b"]
+    assert str(canonical([-0.0])[0]) == "0.0"
+
+    numpy = pytest.importorskip("numpy")
+    value = canonical(numpy.float64(1.5))
+    assert type(value) is float and value == 1.5
+
+    # json, the default format, does not need extra packages.
+    assert digest([1, 2]) == hashlib.sha256(b"[1,2]").hexdigest()
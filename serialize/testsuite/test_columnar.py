@@ -0,0 +1,153 @@
+import pytest
+
+from serialize import dumps, loads, register_class
+from serialize.all import (
+    BACKENDS,
+    BATCH_CLASSES,
+    FORMATS,
+    _get_format,
+    _has_batch,
+    select_backend,
+)
+from serialize.instrument import Stats, instrumented
+
+
+class Point:
+    def __init__(self, t, value):
+        self.t = t
+        self.value = value
+
+    def __eq__(self, other):
+        return (
+            self.__class__ is other.__class__
+            and self.t == other.t
+            and self.value == other.value
+        )
+
+    def __repr__(self):
+        return "Point(%r, %r)" % (self.t, self.value)
+
+
+CALLS = []
+
+
+def to_builtin(point):
+    return point.t, point.value
+
+
+def from_builtin(content):
+    return Point(*content)
+
+
+def to_builtin_many(points):
+    CALLS.append(len(points))
+    return dict(t=[p.t for p in points], value=[p.value for p in points])
+
+
+def from_builtin_many(content):
+    return map(Point, content["t"], content["value"])
+
+
+register_class(Point, to_builtin, from_builtin, to_builtin_many, from_builtin_many)
+
+POINTS = [Point(t, t * 0.5) for t in range(100)]
+
+OBJ = dict(
+    series=POINTS,
+    mixed=[Point(1, 2.0), 3, Point(4, 5.0)],
+    nested=[[Point(1, 1.0)], []],
+    single=Point(7, 8.0),
+)
+
+
+@pytest.mark.parametrize("fmt", sorted(FORMATS))
+def test_columnar_round_trip(fmt):
+    if fmt == "phpserialize":
+        pytest.skip("phpserialize loads lists as dicts")
+    try:
+        _get_format(fmt)
+    except ValueError:
+        pytest.skip("%s is not available" % fmt)
+
+    assert loads(dumps(OBJ, fmt), fmt) == OBJ
+    assert loads(dumps(POINTS, fmt), fmt) == POINTS
+
+
+# Import the json module, so that all backends are registered.
+_get_format("json")
+
+
+@pytest.mark.parametrize(
+    "fmt,backend", [("json", backend) for backend in BACKENDS["json"]]
+)
+def test_columnar_json_backends(fmt, backend):
+    select_backend(fmt, backend)
+    try:
+        del CALLS[:]
+        content = dumps(OBJ, fmt)
+        # One call for the series and one for the nested list.
+        assert CALLS == [100, 1]
+        assert content.count(b"__dumped_many__") == 2
+        assert loads(content, fmt) == OBJ
+    finally:
+        select_backend(fmt)
+
+
+@pytest.mark.parametrize("fmt", ["msgpack", "bson"])
+def test_columnar_calls(fmt):
+    try:
+        _get_format(fmt)
+    except ValueError:
+        pytest.skip("%s is not available" % fmt)
+
+    del CALLS[:]
+    dumps(dict(series=POINTS), fmt)
+    assert CALLS == [100]
+
+
+class Records(list):
+    """A list whose elements, except the first one, must not be scanned."""
+
+    def __iter__(self):
+        raise AssertionError("the records were scanned")
+
+    def __getitem__(self, key):
+        if key not in (0, slice(None, 1)):
+            raise AssertionError("the records were scanned")
+        return list.__getitem__(self, key)
+
+
+@pytest.mark.parametrize("fmt", ["json", "msgpack"])
+def test_columnar_scan(fmt):
+    _get_format(fmt)
+
+    records = Records(dict(n=ndx, values=[ndx]) for ndx in range(100))
+    assert not _has_batch(dict(records=records), BATCH_CLASSES)
+    assert _has_batch([dict(series=POINTS), dict(n=1)], BATCH_CLASSES)
+
+    # Batch lists are looked for in the first element of each list only,
+    # when another one is found, the whole document is traversed.
+    obj = [dict(series=[]), dict(series=POINTS)]
+    del CALLS[:]
+    assert loads(dumps(obj, fmt), fmt) == obj
+    assert CALLS == []
+
+    obj = [dict(series=POINTS[:2]), dict(series=POINTS)]
+    del CALLS[:]
+    assert loads(dumps(obj, fmt), fmt) == obj
+    assert CALLS == [2, 100]
+
+
+def test_columnar_instrument():
+    stats = Stats()
+    with instrumented(stats):
+        loads(dumps(POINTS, "json"), "json")
+
+    totals = stats.totals
+    assert totals[("json", "dumps")].classes == {str(Point): 100}
+    assert totals[("json", "loads")].classes == {str(Point): 100}
+
+
+def test_columnar_register_errors():
+    with pytest.raises(ValueError, match="together"):
+        register_class(Point, to_builtin, from_builtin, to_builtin_many)
@@ -0,0 +1,88 @@
+import io
+import tracemalloc
+
+import pytest
+
+from serialize import dump, dump_many, dumps, iter_load, load, loads
+from serialize.all import _get_format
+from serialize.compression import get_codec
+
+OBJ = dict(a=[1, 2, 3] * 100, b="text" * 100, c=dict(d=1.5))
+
+CODECS = ["gzip", "bz2", "lzma", "zstd", "lz4"]
+FMTS = ["json", "msgpack", "pickle", "yaml"]
+
+
+def _check(fmt):
+    try:
+        _get_format(fmt)
+    except ValueError as ex:
+        pytest.skip(str(ex))
+
+
+@pytest.mark.parametrize("codec", CODECS)
+@pytest.mark.parametrize("base", FMTS)
+def test_compressed(base, codec, tmp_path):
+    fmt = base + "+" + codec
+    _check(fmt)
+
+    content = dumps(OBJ, fmt)
+    assert len(content) < len(dumps(OBJ, base))
+    assert loads(content, fmt) == OBJ
+
+    buf = io.BytesIO()
+    dump(OBJ, buf, fmt)
+    buf.seek(0)
+    assert load(buf, fmt) == OBJ
+    assert loads(buf.getvalue(), fmt) == OBJ
+
+    filename = tmp_path / ("data.%s" % _get_format(fmt).extension)
+    dump(OBJ, filename)
+    assert load(filename, fmt) == OBJ
+    assert load(filename) == OBJ
+    assert load(filename, mmap=True) == OBJ
+
+    dump_many([OBJ, [1], "x"], filename)
+    assert list(iter_load(filename)) == [OBJ, [1], "x"]
+
+
+def test_compressed_extension(tmp_path):
+    filename = tmp_path / "data.v1.json.gz"
+    dump(OBJ, filename)
+    assert get_codec("gz").decompress(filename.read_bytes()) == dumps(OBJ, "json")
+    assert load(filename) == OBJ
+    assert load(filename, "json+gz") == OBJ
+
+    # The extension of the codec alone is not a format.
+    with pytest.raises(ValueError):
+        dump(OBJ, tmp_path / "data.gz")
+
+
+def test_compressed_errors():
+    with pytest.raises(ValueError, match="unknown compression"):
+        dumps(OBJ, "json+rar")
+    with pytest.raises(ValueError, match="unknown format"):
+        dumps(OBJ, "nope+gzip")
+
+
+@pytest.mark.parametrize("base", ["msgpack", "pickle"])
+def test_compressed_streaming(base, tmp_path):
+    fmt = base + "+gzip"
+    _check(fmt)
+
+    obj = dict(values=[dict(n=ndx, text="%08d" % ndx * 200) for ndx in range(8000)])
+    size = len(dumps(obj, base))
+
+    tracemalloc.start()
+    try:
+        with open(tmp_path / "data", "wb") as fp:
+            dump(obj, fp, fmt)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    # The serialized content is not held in memory at once.
+    assert peak < size / 8
+
+    with open(tmp_path / "data", "rb") as fp:
+        assert load(fp, fmt) == obj
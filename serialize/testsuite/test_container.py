@@ -0,0 +1,118 @@
+import pytest
+
+from serialize import dumps
+from serialize.container import Container
+
+OBJS = {"r%d" % ndx: dict(n=ndx, values=[ndx] * ndx) for ndx in range(50)}
+
+
+def test_container(tmp_path):
+    filename = tmp_path / "data.srzc"
+
+    with Container(filename, "w") as box:
+        box.put_many(OBJS.items())
+        box.put("text", "hello", fmt="json")
+        # Records can be read before the index is written.
+        assert box["r3"] == OBJS["r3"]
+
+    box = Container(filename)
+    assert len(box) == 51
+    assert box["r7"] == OBJS["r7"]
+    assert box.get("text") == "hello"
+    assert box.get("missing", 0) == 0
+    assert box.get_bytes("text") == (dumps("hello", "json"), "json")
+    assert box.get_many(["r9", "r1", "r9"]) == [OBJS["r9"], OBJS["r1"], OBJS["r9"]]
+    assert dict(box.items()) == dict(OBJS, text="hello")
+    assert "r0" in box and "missing" not in box
+
+    with pytest.raises(KeyError):
+        box["missing"]
+    with pytest.raises(KeyError):
+        box.get_many(["r1", "missing"])
+    with pytest.raises(ValueError):
+        box.put("x", 1)
+    box.close()
+
+
+def test_container_append_and_compact(tmp_path):
+    filename = tmp_path / "data.srzc"
+
+    with Container(filename, "a", fmt="json") as box:
+        box.put_many(OBJS.items())
+
+    with Container(filename, "a") as box:
+        box["r1"] = "replaced"
+        box.delete("r2")
+        del box["r3"]
+        assert box["r1"] == "replaced"
+        garbage = box.garbage()
+        assert garbage > 0
+
+    size = filename.stat().st_size
+    with Container(filename, "a") as box:
+        assert box["r1"] == "replaced" and "r2" not in box
+        assert box.get_bytes("r4")[1] == "json"
+
+        box.compact()
+        assert box.garbage() == 0
+        assert filename.stat().st_size < size - garbage + 100
+        assert box["r5"] == OBJS["r5"]
+        box.put("new", [1])
+
+    assert not list(tmp_path.glob("*.compact"))
+
+    box = Container(filename)
+    assert len(box) == 49
+    assert box["new"] == [1] and box["r1"] == "replaced"
+    box.close()
+
+
+def test_container_errors(tmp_path):
+    filename = tmp_path / "data.srzc"
+
+    with pytest.raises(ValueError):
+        Container(filename, "x")
+    with pytest.raises(FileNotFoundError):
+        Container(filename)
+
+    filename.write_bytes(b"not a container")
+    with pytest.raises(ValueError):
+        Container(filename)
+
+    box = Container(filename, "w")
+    with pytest.raises(TypeError):
+        box.put(1, "x")
+    assert len(box) == 0
+    box.put("a", 1)
+    box._fp.flush()
+    # The file is readable while records are added, with the previous index.
+    with Container(filename) as reader:
+        assert len(reader) == 0
+    box.flush()
+    box.put("b", 2)
+    box._fp.flush()
+    with Container(filename) as reader:
+        assert list(reader) == ["a"] and reader["a"] == 1
+    box.close()
+    with Container(filename) as box:
+        assert box["a"] == 1 and box["b"] == 2
+
+
+def test_container_interrupted(tmp_path):
+    filename = tmp_path / "data.srzc"
+    with Container(filename, "w") as box:
+        box.put_many(OBJS.items())
+
+    # A writer that is not closed leaves the file as it was.
+    box = Container(filename, "a")
+    box["r1"] = "replaced"
+    box.put_many(("new%d" % ndx, ndx) for ndx in range(10))
+    box._fp.flush()
+    with Container(filename) as reader:
+        assert len(reader) == 50 and reader["r1"] == OBJS["r1"]
+    box._fp.close()
+
+    with Container(filename, "a") as box:
+        assert len(box) == 50
+        box.compact()
+    assert dict(Container(filename).items()) == OBJS
@@ -0,0 +1,81 @@
+import logging
+
+import pytest
+
+from serialize import all, dump, dumps, load, loads, register_class
+from serialize.instrument import LoggingSink, Stats, disable, enable, instrumented
+
+
+class Y:
+    def __init__(self, value):
+        self.value = value
+
+    def __eq__(self, other):
+        return self.__class__ is other.__class__ and self.value == other.value
+
+
+register_class(Y, lambda obj: obj.value, Y)
+
+OBJ = dict(a=[Y(1), Y(2)], b=Y(3))
+
+
+@pytest.mark.parametrize("fmt", ["json", "msgpack"])
+def test_instrument_stats(fmt):
+    stats = Stats()
+    with instrumented(stats):
+        content = dumps(OBJ, fmt)
+        assert loads(content, fmt) == OBJ
+        assert loads(bytearray(content), fmt) == OBJ
+
+    assert all._INSTRUMENT is None
+
+    totals = stats.totals
+    name = str(Y)
+    assert totals[(fmt, "dumps")].calls == 1
+    assert totals[(fmt, "dumps")].nbytes == len(content)
+    assert totals[(fmt, "dumps")].classes == {name: 3}
+    assert totals[(fmt, "loads")].calls == 2
+    assert totals[(fmt, "loads")].nbytes == 2 * len(content)
+    assert totals[(fmt, "loads")].classes == {name: 6}
+    assert totals[(fmt, "loads")].seconds > 0
+
+    stats.reset()
+    assert stats.totals == {}
+
+
+@pytest.mark.parametrize("mmap", [False, True])
+def test_instrument_files(tmp_path, mmap):
+    fn = tmp_path / "data.pickle"
+    events = []
+
+    enable(events.append)
+    try:
+        dump(OBJ, fn)
+        assert load(fn, mmap=mmap) == OBJ
+    finally:
+        disable()
+
+    size = fn.stat().st_size
+    assert [(e.fmt, e.op, e.nbytes) for e in events] == [
+        ("pickle", "dump", size),
+        ("pickle", "load", size),
+    ]
+
+
+def test_instrument_logging(caplog):
+    with caplog.at_level(logging.DEBUG, logger="serialize"):
+        with instrumented(LoggingSink()):
+            dumps(OBJ, "json")
+
+    assert "json dumps" in caplog.text
+
+
+def test_instrument_disabled():
+    stats = Stats()
+    with instrumented(stats):
+        pass
+    dumps(OBJ, "json")
+    assert stats.totals == {}
+
+    with pytest.raises(ValueError):
+        enable()
@@ -0,0 +1,165 @@
+import io
+import time
+
+import pytest
+
+from serialize import LazyDocument, dump, dumps, load_path, register_class
+from serialize.all import _get_format
+
+
+class Tracked:
+    decoded = 0
+
+    def __init__(self, value):
+        self.value = value
+
+    def __eq__(self, other):
+        return isinstance(other, Tracked) and self.value == other.value
+
+
+def _to_builtin(obj):
+    return obj.value
+
+
+def _from_builtin(value):
+    Tracked.decoded += 1
+    return Tracked(value)
+
+
+register_class(Tracked, _to_builtin, _from_builtin)
+
+OBJ = dict(
+    meta=dict(name="run", tags=["a", "b"], escaped='q"}]'),
+    series=[dict(t=ndx, v=[ndx / 2] * 3, o=Tracked(ndx)) for ndx in range(20)],
+    last=None,
+)
+
+FMTS = ["json", "json:pretty", "msgpack", "bson", "pickle", "yaml", "json+gzip"]
+
+PATHS = [
+    ("meta",),
+    ("meta", "name"),
+    ("meta", "tags", 1),
+    ("meta", "tags", -2),
+    ("meta", "escaped"),
+    ("series", 3, "v", 0),
+    ("series", -1),
+    ("series", 7, "o"),
+    ("last",),
+]
+
+
+def _walk(obj, path):
+    for key in path:
+        obj = obj[key]
+    return obj
+
+
+def _check(fmt):
+    try:
+        _get_format(fmt)
+    except ValueError as ex:
+        pytest.skip(str(ex))
+
+
+@pytest.fixture(params=FMTS)
+def fmt(request):
+    _check(request.param)
+    return request.param
+
+
+def test_load_path(fmt):
+    content = dumps(OBJ, fmt)
+
+    for path in PATHS:
+        assert load_path(io.BytesIO(content), fmt, path) == _walk(OBJ, path)
+
+    assert load_path(io.BytesIO(content), fmt) == OBJ
+
+
+def test_load_path_errors(fmt):
+    content = dumps(OBJ, fmt)
+
+    with pytest.raises(KeyError):
+        load_path(io.BytesIO(content), fmt, ("missing",))
+    with pytest.raises(KeyError):
+        load_path(io.BytesIO(content), fmt, ("meta", "missing"))
+    with pytest.raises(IndexError):
+        load_path(io.BytesIO(content), fmt, ("series", 20))
+    with pytest.raises(IndexError):
+        load_path(io.BytesIO(content), fmt, ("series", -21))
+    with pytest.raises(TypeError):
+        load_path(io.BytesIO(content), fmt, ("series", "t"))
+
+
+def test_load_path_registered(fmt):
+    # Registered classes are decoded and the rest of the path applied to them.
+    obj = dict(a=Tracked(dict(x=[1, 2])))
+    for content in (dumps(obj, fmt), dumps(obj["a"], fmt)):
+        with pytest.raises(TypeError):
+            load_path(io.BytesIO(content), fmt, ("a", "x"))
+        with pytest.raises(TypeError):
+            load_path(io.BytesIO(content), fmt, ("a", "__dumped_obj__"))
+
+    content = dumps(obj, fmt)
+    assert load_path(io.BytesIO(content), fmt, ("a",)) == obj["a"]
+
+
+def test_load_path_canonical():
+    _check("msgpack:canonical")
+    content = dumps(dict(a=Tracked(dict(x=[1, 2]))), "msgpack:canonical")
+    assert load_path(io.BytesIO(content), "msgpack", ("a",)) == Tracked(dict(x=[1, 2]))
+    with pytest.raises(TypeError):
+        load_path(io.BytesIO(content), "msgpack", ("a", "__dumped_obj__"))
+
+
+@pytest.mark.parametrize("fmt", ["json", "msgpack", "bson"])
+def test_load_path_decodes_selected(fmt):
+    _check(fmt)
+    content = dumps(OBJ, fmt)
+
+    Tracked.decoded = 0
+    assert load_path(io.BytesIO(content), fmt, ("series", 5)) == OBJ["series"][5]
+    assert Tracked.decoded == 1
+
+    Tracked.decoded = 0
+    assert load_path(io.BytesIO(content), fmt, ("meta",)) == OBJ["meta"]
+    assert Tracked.decoded == 0
+
+
+def test_lazy_document(fmt, tmp_path):
+    filename = tmp_path / ("data.%s" % _get_format(fmt).extension)
+    dump(OBJ, filename, fmt)
+
+    doc = LazyDocument(str(filename), fmt)
+    assert doc["series"][-1]["t"].load() == 19
+    assert doc["meta"].load() == OBJ["meta"]
+    assert doc.load() == OBJ
+
+    # A file-like object is read from the position it had.
+    buf = io.BytesIO(b"header" + dumps(OBJ, fmt))
+    buf.seek(6)
+    doc = LazyDocument(buf, fmt)
+    assert doc["series"][2]["o"].load() == Tracked(2)
+    assert doc["meta"]["tags"].load() == ["a", "b"]
+
+
+def test_lazy_document_extension(tmp_path):
+    filename = tmp_path / "data.msgpack"
+    dump(OBJ, filename)
+    assert LazyDocument(filename)["series"][0]["t"].load() == 0
+    assert load_path(filename, path=["meta", "name"]) == "run"
+
+
+def test_load_path_json_deep():
+    # Deeply nested values with long runs of elements are skipped in linear time.
+    inner = list(range(1000)) + ['"]}[{']
+    for _ in range(20):
+        inner = [inner, list(range(100))]
+    content = dumps(dict(a=inner, b=2), "json")
+
+    start = time.perf_counter()
+    assert load_path(io.BytesIO(content), "json", ("b",)) == 2
+    content = b'{"a": [[[[[[[[1, 2, 3, 4, 5, 6, 7, 8, 9, 10, [0]]]]]]]]], "b": 2}'
+    assert load_path(io.BytesIO(content), "json", ("b",)) == 2
+    assert time.perf_counter() - start < 1
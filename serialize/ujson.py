@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+"""
+    serialize.ujson
+    ~~~~~~~~~~~~~~~
+
+    Fast backend for JSON Serialization.
+
+    See https://github.com/ultrajson/ultrajson for more details.
+
+    :copyright: (c) 2016 by Hernan E. Grecco.
+    :license: BSD, see LICENSE for more details.
+"""
+
+import ujson
+
+from . import all, json
+
+
+def dumps(obj):
+    try:
+        return ujson.dumps(
+            all.encode_batches(obj),
+            default=json.default,
+            escape_forward_slashes=False,
+        ).encode("utf-8")
+    except (TypeError, ValueError, OverflowError):
+        # ujson rejects some objects that the standard library
+        # accepts (e.g. integers larger than 64 bits or nan).
+        return json.dumps(obj)
+
+
+def loads(content):
+    if not isinstance(content, (bytes, str)):
+        content = str(content, "utf-8")
+    try:
+        obj = ujson.loads(content)
+    except ValueError:
+        # ujson rejects some documents that the standard library
+        # accepts (e.g. large integers).
+        return json.loads(content)
+    if json.has_envelope(content):
+        obj = all.traverse_and_decode(obj, trav_dict=all.OBJECT_HOOK_TRAVERSE_DC)
+    return obj
+
+
+dump_many, iter_load = json.json_lines(dumps, loads)
+
+all.register_format(
+    "json",
+    dumps,
+    loads,
+    dump_many=dump_many,
+    iter_load=iter_load,
+    backend="ujson",
+    priority=10,
+)
@@ -31,12 +31,24 @@ except ImportError:
 SERIALIZED_TAG = "tag:github.com/hgrecco/serialize,2019:python/serialize-encode"
 
 
-class Dumper(yaml.Dumper):
+# Use the much faster libyaml bindings if PyYAML was built with them.
+BaseDumper = getattr(yaml, "CDumper", yaml.Dumper)
+BaseLoader = getattr(yaml, "CLoader", yaml.Loader)
+
+
+class Dumper(BaseDumper):
     def represent_serialized(self, data):
         return self.represent_mapping(SERIALIZED_TAG, all.encode(data))
 
+    def represent_object(self, data):
+        # Registering a lazy class (see serialize.all.register_lazy_class)
+        # adds its representer.
+        if all._load_lazy_class(str(type(data))):
+            return self.represent_data(data)
+        return super().represent_object(data)
 
-class Loader(yaml.Loader):
+
+class Loader(BaseLoader):
     def construct_serialized(self, node):
         assert node.tag == SERIALIZED_TAG
         assert isinstance(node, MappingNode)
@@ -44,18 +56,93 @@ class Loader(yaml.Loader):
         return all.decode(dct)
 
 
+# The safe subformat only loads standard YAML tags and registered classes.
+
+BaseSafeDumper = getattr(yaml, "CSafeDumper", yaml.SafeDumper)
+BaseSafeLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+
+class SafeDumper(BaseSafeDumper):
+    represent_serialized = Dumper.represent_serialized
+
+    def represent_undefined(self, data):
+        if all._load_lazy_class(str(type(data))):
+            return self.represent_data(data)
+        return super().represent_undefined(data)
+
+
+Dumper.add_multi_representer(object, Dumper.represent_object)
+SafeDumper.add_representer(None, SafeDumper.represent_undefined)
+
+
+class SafeLoader(BaseSafeLoader):
+    construct_serialized = Loader.construct_serialized
+
+
 def dumps(obj):
     return yaml.dump(obj, Dumper=Dumper).encode("utf-8")
 
 
 def loads(content):
-    return yaml.load(content.decode("utf-8"), Loader=Loader)
+    return yaml.load(str(content, "utf-8"), Loader=Loader)
+
+
+def dump_many(objs, fp):
+    yaml.dump_all(objs, fp, Dumper=Dumper, encoding="utf-8")
+
+
+def iter_load(fp):
+    return yaml.load_all(fp, Loader=Loader)
+
+
+def dumps_safe(obj):
+    return yaml.dump(obj, Dumper=SafeDumper).encode("utf-8")
+
+
+def loads_safe(content):
+    return yaml.load(str(content, "utf-8"), Loader=SafeLoader)
+
+
+def dump_many_safe(objs, fp):
+    yaml.dump_all(objs, fp, Dumper=SafeDumper, encoding="utf-8")
+
+
+def iter_load_safe(fp):
+    return yaml.load_all(fp, Loader=SafeLoader)
 
 
 def _register_class(klass):
+    if klass not in all.CLASSES:
+        # Unregistered.
+        Dumper.yaml_representers.pop(klass, None)
+        return
     Dumper.add_representer(klass, Dumper.represent_serialized)
 
     Loader.add_constructor(SERIALIZED_TAG, Loader.construct_serialized)
 
 
-all.register_format("yaml", dumps, loads, register_class=_register_class)
+def _register_class_safe(klass):
+    if klass not in all.CLASSES:
+        SafeDumper.yaml_representers.pop(klass, None)
+        return
+    SafeDumper.add_representer(klass, SafeDumper.represent_serialized)
+
+    SafeLoader.add_constructor(SERIALIZED_TAG, SafeLoader.construct_serialized)
+
+
+all.register_format(
+    "yaml",
+    dumps,
+    loads,
+    register_class=_register_class,
+    dump_many=dump_many,
+    iter_load=iter_load,
+)
+all.register_format(
+    "yaml:safe",
+    dumps_safe,
+    loads_safe,
+    register_class=_register_class_safe,
+    dump_many=dump_many_safe,
+    iter_load=iter_load_safe,
+)
@@ -21,18 +21,23 @@ except ImportError:
     raise
 
 
-class Dumper(yaml.Dumper):
+# Use the much faster libyaml bindings if PyYAML was built with them.
+BaseDumper = getattr(yaml, "CDumper", yaml.Dumper)
+BaseLoader = getattr(yaml, "CLoader", yaml.Loader)
+
+
+class Dumper(BaseDumper):
     def represent_data(self, data):
         return super().represent_data(all.encode(data))
 
 
-class Loader(yaml.Loader):
+class Loader(BaseLoader):
     def construct_object(self, node, deep=False):
         # It seems that pyyaml is changing the internal structure of the node
         tmp = super().construct_object(node, deep)
 
         if isinstance(node, MappingNode):
-            dct = super().construct_mapping(node, deep)
+            dct = super().construct_mapping(node, deep=True)
             decoded = all.decode(dct)
             if decoded is not dct:
                 return decoded
@@ -45,7 +50,17 @@ def dumps(obj):
 
 
 def loads(content):
-    return yaml.load(content.decode("utf-8"), Loader=Loader)
+    return yaml.load(str(content, "utf-8"), Loader=Loader)
+
+
+def dump_many(objs, fp):
+    yaml.dump_all(objs, fp, Dumper=Dumper, encoding="utf-8")
+
+
+def iter_load(fp):
+    return yaml.load_all(fp, Loader=Loader)
 
 
-all.register_format("yaml:legacy", dumps, loads)
+all.register_format(
+    "yaml:legacy", dumps, loads, dump_many=dump_many, iter_load=iter_load
+)